@@ -1,44 +1,338 @@
 import os
 import json
 import re
-from typing import List, Dict, Any
-from openai import OpenAI
+import time
+import random
+import asyncio
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
+from llm_cache import LLMCache
+from metrics import LLM_REQUEST_SECONDS, LLM_TOKENS, LLM_RETRIES, LLM_FALLBACKS
+from text_utils import normalize_text, feedback_count
+
 logger = logging.getLogger(__name__)
 
+LLM_MODEL = "gpt-4o-mini"
+LLM_TEMPERATURE = 0.1
+
+# Bump when the rules or prompts change so /process re-analyzes every product
+EXTRACTOR_VERSION = "1"
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    """Errors worth retrying with backoff; anything else falls back immediately"""
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+def _number(value: Any, default: float) -> float:
+    """Numeric field of an LLM-produced issue, or default when it is not a number"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def record_usage(response, prompt: str, content: str):
+    """Count a completion's tokens, estimating them when the API reports no usage"""
+    usage = getattr(response, "usage", None)
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", None) or estimate_tokens(prompt), direction="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", None) or estimate_tokens(content), direction="completion")
+
+# Rule-based extraction vocabulary
+SIZE_KEYWORDS = {
+    "runs_small": ["tight", "small", "snug", "narrow"],
+    "runs_large": ["loose", "baggy", "large", "big", "oversized"],
+    "sleeve_short": ["sleeve short", "short sleeve", "sleeves short"],
+    "sleeve_long": ["sleeve long", "long sleeve", "sleeves long"],
+    "length_short": ["short length", "too short", "length short"],
+    "length_long": ["long length", "too long", "length long"]
+}
+
+CARE_KEYWORDS = {
+    "color_fade": ["color faded", "color fade", "fading", "color bleed"],
+    "shrink": ["shrink", "shrunk", "shrinkage"],
+    "stretch": ["stretch", "stretched", "stretchy"],
+    "wrinkle": ["wrinkle", "wrinkled", "creased"]
+}
+
+BODY_AREAS = {
+    "waist": ["waist", "torso", "middle"],
+    "sleeve": ["sleeve", "arm", "shoulder"],
+    "length": ["length", "hem", "long", "short"],
+    "color": ["color", "fade", "bleed"],
+    "overall": ["overall", "general", "fit"]
+}
+
+SEVERITY_MODIFIERS = {
+    "up": ["very", "extremely"],
+    "down": ["slightly"]
+}
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """Regex alternation factored into a prefix trie, longest match first"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def emit(node: Dict[str, Dict]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+    
+    return emit(trie)
+
+class KeywordMatcher:
+    """Finds every keyword occurrence, overlaps included, in one regex pass.
+
+    A zero-width lookahead over a trie-shaped alternation reports the
+    longest keyword starting at each position; shorter keywords that are
+    prefixes of it are added from a precomputed table, so no occurrence
+    is lost to alternation order.
+    """
+
+    def __init__(self, groups: Dict[Tuple[str, str], List[str]]):
+        labels_for = defaultdict(set)
+        for label, keywords in groups.items():
+            for keyword in keywords:
+                labels_for[keyword].add(label)
+        
+        keywords = sorted(labels_for)
+        self.pattern = re.compile("(?=(" + _trie_pattern(keywords) + "))")
+        self.labels_at = {
+            keyword: frozenset().union(*(labels_for[other] for other in keywords if keyword.startswith(other)))
+            for keyword in keywords
+        }
+        self._labels_cache: Dict[frozenset, frozenset] = {}
+
+    def match(self, text: str) -> frozenset:
+        """Labels of every keyword found in text"""
+        found = frozenset(self.pattern.findall(text))
+        labels = self._labels_cache.get(found)
+        if labels is None:
+            labels = frozenset().union(*(self.labels_at[keyword] for keyword in found))
+            self._labels_cache[found] = labels
+        return labels
+
+RULE_MATCHER = KeywordMatcher({
+    **{("fit", name): kws for name, kws in SIZE_KEYWORDS.items()},
+    **{("care", name): kws for name, kws in CARE_KEYWORDS.items()},
+    **{("area", name): kws for name, kws in BODY_AREAS.items()},
+    **{("modifier", name): kws for name, kws in SEVERITY_MODIFIERS.items()}
+})
+
+class RateLimiter:
+    """Token-bucket limiter for requests and tokens per minute"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int):
+        """Wait until one request and the given token budget are available"""
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_requests = (1 - self._requests) * 60 / self.requests_per_minute
+                wait_tokens = (tokens - self._tokens) * 60 / self.tokens_per_minute
+                await asyncio.sleep(max(wait_requests, wait_tokens, 0.01))
+
 class AIProcessor:
     def __init__(self):
         self.openai_key = os.getenv("OPENAI_API_KEY")
-        self.client = None
+        # The openai SDK is slow to import, so clients are built on first use
+        self._client = None
+        self._async_client = None
+        self.cache = None
+        self.concurrency = int(os.getenv("LLM_CONCURRENCY", "8"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "4"))
+        # Products packed into one prompt in batched mode (1 = one call per product)
+        self.batch_products = int(os.getenv("LLM_BATCH_PRODUCTS", "1"))
+        self.batch_token_budget = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "6000"))
+        # Map-reduce extraction: feedback tokens per chunk, per text, and chunks per product
+        self.chunk_token_budget = int(os.getenv("LLM_CHUNK_TOKEN_BUDGET", "3000"))
+        self.max_text_tokens = int(os.getenv("LLM_MAX_TEXT_TOKENS", "250"))
+        self.max_chunks = int(os.getenv("LLM_MAX_CHUNKS", "20"))
+        self._semaphore = None
+        self._rate_limiter = None
         if self.openai_key:
-            self.client = OpenAI(api_key=self.openai_key)
+            self.cache = LLMCache.from_env()
     
-    def clean_text(self, text: str) -> str:
-        """Clean and normalize text"""
-        if not text:
-            return ""
+    @property
+    def llm_enabled(self) -> bool:
+        """Whether LLM calls are configured, without building a client"""
+        return bool(self.openai_key) or self._client is not None
+    
+    @property
+    def extractor(self) -> str:
+        """Tag of the extraction that /process would run now, stored with each fingerprint"""
+        return f"llm:{LLM_MODEL}:{EXTRACTOR_VERSION}" if self.llm_enabled else f"rules:{EXTRACTOR_VERSION}"
+    
+    @property
+    def client(self):
+        """Sync OpenAI client, or None without an API key"""
+        if self._client is None and self.openai_key:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.openai_key)
+        return self._client
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    @property
+    def async_client(self):
+        """Async OpenAI client, or None without an API key"""
+        if self._async_client is None and self.openai_key:
+            from openai import AsyncOpenAI
+            # Retries are handled by complete_async so they respect the rate limiter
+            self._async_client = AsyncOpenAI(api_key=self.openai_key, max_retries=0)
+        return self._async_client
+    
+    @async_client.setter
+    def async_client(self, value):
+        self._async_client = value
+    
+    def complete(self, prompt: str, max_tokens: int) -> str:
+        """Run a chat completion, serving byte-identical prompts from the cache"""
+        if self.cache:
+            cached = self.cache.get(LLM_MODEL, LLM_TEMPERATURE, prompt)
+            if cached is not None:
+                return cached
+        
+        started = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=LLM_TEMPERATURE,
+                max_tokens=max_tokens
+            )
+        except Exception:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+            raise
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="success")
+        content = response.choices[0].message.content.strip()
+        record_usage(response, prompt, content)
         
-        # Convert to lowercase
-        text = text.lower().strip()
+        if self.cache:
+            self.cache.put(LLM_MODEL, LLM_TEMPERATURE, prompt, content)
+        return content
+    
+    async def complete_async(self, prompt: str, max_tokens: int) -> str:
+        """Async completion bounded by LLM_CONCURRENCY and the per-minute limits.
+
+        Transient API errors are retried with exponential backoff and jitter.
+        """
+        if self.cache:
+            cached = self.cache.get(LLM_MODEL, LLM_TEMPERATURE, prompt)
+            if cached is not None:
+                return cached
         
-        # Remove basic emojis and special characters
-        text = re.sub(r'[^\w\s\-\.,!?]', '', text)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._rate_limiter = RateLimiter(
+                int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+                int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+            )
         
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        async with self._semaphore:
+            started = time.perf_counter()
+            for attempt in range(self.max_retries + 1):
+                await self._rate_limiter.acquire(estimate_tokens(prompt) + max_tokens)
+                try:
+                    response = await self.async_client.chat.completions.create(
+                        model=LLM_MODEL,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=LLM_TEMPERATURE,
+                        max_tokens=max_tokens
+                    )
+                    break
+                except retryable_errors() as e:
+                    if attempt == self.max_retries:
+                        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+                        raise
+                    LLM_RETRIES.inc()
+                    delay = min(30.0, 2 ** attempt) * (0.5 + random.random())
+                    logger.warning(f"LLM call failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                except Exception:
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+                    raise
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="success")
         
-        return text
+        content = response.choices[0].message.content.strip()
+        record_usage(response, prompt, content)
+        if self.cache:
+            self.cache.put(LLM_MODEL, LLM_TEMPERATURE, prompt, content)
+        return content
     
-    def extract_issues_llm(self, product_id: str, texts: List[str]) -> List[Dict[str, Any]]:
-        """Extract issues using LLM"""
-        if not self.client:
-            return self.extract_issues_rule_based(product_id, texts)
+    def clean_text(self, text: str) -> str:
+        """Clean and normalize text (the same canonical form stored at upload)"""
+        return normalize_text(text)
+    
+    def chunk_texts(self, feedback: List[Tuple[str, int]]) -> List[List[Tuple[str, int]]]:
+        """Pack (text, count) pairs into token-budgeted chunks.
+
+        Empty texts are skipped and each text is cut to LLM_MAX_TEXT_TOKENS.
+        Common texts come first, so when a product needs more than
+        LLM_MAX_CHUNKS chunks it is the rarest texts that are left out.
+        """
+        chunks, current, used = [], [], 0
+        for text, count in sorted(feedback, key=lambda pair: -pair[1]):
+            if not text:
+                continue
+            text = text[:self.max_text_tokens * 4]
+            size = estimate_tokens(text) + 2
+            if current and used + size > self.chunk_token_budget:
+                chunks.append(current)
+                current, used = [], 0
+            current.append((text, count))
+            used += size
+        if current:
+            chunks.append(current)
         
-        try:
-            batch_text = "\n".join([f"- {text}" for text in texts[:50]])
-            
-            prompt = f"""Analyze the following product feedback texts and extract recurring fit or care issues. 
+        if len(chunks) > self.max_chunks > 0:
+            dropped = sum(feedback_count(chunk) for chunk in chunks[self.max_chunks:])
+            logger.warning(f"Feedback exceeds {self.max_chunks} chunks; leaving out {dropped} of the rarest texts")
+            chunks = chunks[:self.max_chunks]
+        return chunks
+    
+    def format_texts(self, chunk: List[Tuple[str, int]]) -> str:
+        """Bullet list of a chunk, marking repeated texts with their count"""
+        return "\n".join(f"- {text} (x{count})" if count > 1 else f"- {text}" for text, count in chunk)
+    
+    def build_extraction_prompt(self, product_id: str, chunk: List[Tuple[str, int]]) -> str:
+        """Prompt asking the LLM for a JSON array of issues"""
+        batch_text = self.format_texts(chunk)
+        
+        return f"""Analyze the following product feedback texts and extract recurring fit or care issues. 
 Return ONLY a JSON array where each item has these exact fields:
 - product_id: "{product_id}"  
 - issue_category: "fit" or "care"
@@ -48,105 +342,241 @@ Return ONLY a JSON array where each item has these exact fields:
 - frequency_hint: integer 0-100 (rough percentage of texts mentioning this issue)
 
 Focus on recurring problems, ignore compliments. Merge similar phrases.
+A trailing (xN) means N customers wrote that same text.
 
 Texts:
 {batch_text}"""
+    
+    def parse_issues(self, content: str) -> Optional[List[Dict[str, Any]]]:
+        """Pull the issue list out of an LLM response, or None if absent"""
+        json_match = re.search(r'\[.*\]', content, re.DOTALL)
+        if not json_match:
+            return None
+        issues = json.loads(json_match.group(0))
+        return [issue for issue in issues if isinstance(issue, dict)]
+    
+    def merge_chunk_issues(self, product_id: str, chunk_issues: List[Tuple[List[Dict[str, Any]], int]]) -> List[Dict[str, Any]]:
+        """Reduce per-chunk issue lists into one, weighting each chunk by its text count.
 
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=1000
-            )
-            
-            content = response.choices[0].message.content.strip()
-            # Try to extract JSON from response
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                issues = json.loads(json_str)
-                return [issue for issue in issues if isinstance(issue, dict)]
-            else:
-                logger.warning(f"No JSON found in LLM response for {product_id}")
-                return self.extract_issues_rule_based(product_id, texts)
+        An issue's frequency_hint becomes its mentions across all chunks
+        (zero where a chunk did not report it) over all texts; severity is
+        averaged over the chunks that reported it, weighted by mentions.
+        """
+        if len(chunk_issues) == 1:
+            return chunk_issues[0][0]
+        
+        total = sum(weight for _, weight in chunk_issues) or 1
+        merged: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        for issues, weight in chunk_issues:
+            for issue in issues:
+                key = (issue.get("issue_category", ""), issue.get("body_area", ""), issue.get("descriptor", ""))
+                mentions = _number(issue.get("frequency_hint"), 0) / 100 * weight
+                entry = merged.setdefault(key, {"mentions": 0.0, "severity": 0.0, "severity_weight": 0.0})
+                entry["mentions"] += mentions
+                entry["severity"] += _number(issue.get("severity"), 3) * (mentions or 1e-9)
+                entry["severity_weight"] += mentions or 1e-9
+        
+        return [
+            {
+                "product_id": product_id,
+                "issue_category": category,
+                "body_area": body_area,
+                "descriptor": descriptor,
+                "severity": round(entry["severity"] / entry["severity_weight"]),
+                "frequency_hint": min(100, round(entry["mentions"] / total * 100))
+            }
+            for (category, body_area, descriptor), entry in merged.items()
+        ]
+    
+    def extract_chunk(self, product_id: str, chunk: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        """Issues for one chunk, falling back to rules for that chunk's texts"""
+        try:
+            content = self.complete(self.build_extraction_prompt(product_id, chunk), max_tokens=1000)
+            issues = self.parse_issues(content)
+            if issues is not None:
+                return issues
+            logger.warning(f"No JSON found in LLM response for {product_id}")
+            LLM_FALLBACKS.inc(step="extraction", reason="unparseable")
                 
         except Exception as e:
             logger.error(f"LLM extraction failed for {product_id}: {e}")
-            return self.extract_issues_rule_based(product_id, texts)
+            LLM_FALLBACKS.inc(step="extraction", reason="error")
+        return self.extract_issues_rule_based(product_id, chunk)
     
-    def extract_issues_rule_based(self, product_id: str, texts: List[str]) -> List[Dict[str, Any]]:
-        """Fallback rule-based extraction"""
-        issues = []
+    async def extract_chunk_async(self, product_id: str, chunk: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        """Async extract_chunk"""
+        try:
+            content = await self.complete_async(self.build_extraction_prompt(product_id, chunk), max_tokens=1000)
+            issues = self.parse_issues(content)
+            if issues is not None:
+                return issues
+            logger.warning(f"No JSON found in LLM response for {product_id}")
+            LLM_FALLBACKS.inc(step="extraction", reason="unparseable")
+                
+        except Exception as e:
+            logger.error(f"LLM extraction failed for {product_id}: {e}")
+            LLM_FALLBACKS.inc(step="extraction", reason="error")
+        return self.extract_issues_rule_based(product_id, chunk)
+    
+    def extract_issues_llm(self, product_id: str, feedback: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        """Extract issues from (text, count) pairs using LLM, one call per chunk"""
+        if not self.client:
+            return self.extract_issues_rule_based(product_id, feedback)
         
-        # Define keyword mappings
-        size_keywords = {
-            "runs_small": ["tight", "small", "snug", "narrow"],
-            "runs_large": ["loose", "baggy", "large", "big", "oversized"],
-            "sleeve_short": ["sleeve short", "short sleeve", "sleeves short"],
-            "sleeve_long": ["sleeve long", "long sleeve", "sleeves long"],
-            "length_short": ["short length", "too short", "length short"],
-            "length_long": ["long length", "too long", "length long"]
-        }
+        chunks = self.chunk_texts(feedback)
+        return self.merge_chunk_issues(product_id, [
+            (self.extract_chunk(product_id, chunk), feedback_count(chunk)) for chunk in chunks
+        ]) if chunks else []
+    
+    async def extract_issues_llm_async(self, product_id: str, feedback: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        """Extract issues using the async client, with a product's chunks in flight concurrently"""
+        if not self.async_client:
+            return self.extract_issues_rule_based(product_id, feedback)
         
-        care_keywords = {
-            "color_fade": ["color faded", "color fade", "fading", "color bleed"],
-            "shrink": ["shrink", "shrunk", "shrinkage"],
-            "stretch": ["stretch", "stretched", "stretchy"],
-            "wrinkle": ["wrinkle", "wrinkled", "creased"]
-        }
+        chunks = self.chunk_texts(feedback)
+        if not chunks:
+            return []
+        chunk_issues = await asyncio.gather(*(self.extract_chunk_async(product_id, chunk) for chunk in chunks))
+        return self.merge_chunk_issues(product_id, [
+            (issues, feedback_count(chunk)) for issues, chunk in zip(chunk_issues, chunks)
+        ])
+    
+    def pack_batches(self, sizes: Dict[str, int]) -> List[List[str]]:
+        """Greedily group products into batches under the prompt token budget"""
+        batches, current, used = [], [], 0
+        for product_id, size in sizes.items():
+            if current and (len(current) >= self.batch_products or used + size > self.batch_token_budget):
+                batches.append(current)
+                current, used = [], 0
+            current.append(product_id)
+            used += size
+        if current:
+            batches.append(current)
+        return batches
+    
+    def build_batch_extraction_prompt(self, products: Dict[str, List[Tuple[str, int]]]) -> str:
+        """Prompt asking for issues of several single-chunk products keyed by product_id"""
+        sections = []
+        for product_id, chunk in products.items():
+            sections.append(f"Product {product_id}:\n{self.format_texts(chunk)}")
+        feedback = "\n\n".join(sections)
         
-        body_areas = {
-            "waist": ["waist", "torso", "middle"],
-            "sleeve": ["sleeve", "arm", "shoulder"],
-            "length": ["length", "hem", "long", "short"],
-            "color": ["color", "fade", "bleed"],
-            "overall": ["overall", "general", "fit"]
-        }
+        return f"""Analyze the following product feedback texts, grouped by product, and extract recurring fit or care issues for each product.
+Return ONLY a JSON object mapping each product_id to a JSON array where each item has these exact fields:
+- issue_category: "fit" or "care"
+- body_area: specific area like "waist", "sleeve", "length", "color", etc (or "" if general)
+- descriptor: short snake_case like "runs_small", "color_fade", "shrink", etc
+- severity: integer 1-5 (1=minor, 5=severe)
+- frequency_hint: integer 0-100 (rough percentage of that product's texts mentioning this issue)
+
+Include every product_id below as a key, using [] when it has no recurring issues.
+Focus on recurring problems, ignore compliments. Merge similar phrases within a product.
+A trailing (xN) means N customers wrote that same text.
+
+{feedback}"""
+    
+    def parse_batch_issues(self, content: str, product_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Per-product issue lists from a keyed batch response; missing products are omitted"""
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if not json_match:
+            return {}
+        parsed = json.loads(json_match.group(0))
+        if not isinstance(parsed, dict):
+            return {}
         
-        combined_text = " ".join([self.clean_text(text) for text in texts]).lower()
+        results = {}
+        for product_id in product_ids:
+            issues = parsed.get(product_id)
+            if isinstance(issues, list):
+                results[product_id] = [
+                    {**issue, "product_id": product_id} for issue in issues if isinstance(issue, dict)
+                ]
+        return results
+    
+    async def extract_issues_batch_async(self, products: Dict[str, List[Tuple[str, int]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Extract issues for several products in one call.
+
+        Products missing from the response, or every product if the call
+        or parse fails, fall back to individual extract_issues_llm_async calls,
+        as do products whose feedback spans more than one chunk.
+        """
+        if len(products) == 1 or not self.async_client:
+            return {pid: await self.extract_issues_llm_async(pid, feedback) for pid, feedback in products.items()}
+        
+        chunked = {pid: self.chunk_texts(feedback) for pid, feedback in products.items()}
+        single = {pid: chunks[0] for pid, chunks in chunked.items() if len(chunks) == 1}
+        results = {pid: [] for pid, chunks in chunked.items() if not chunks}
+        if len(single) > 1:
+            try:
+                prompt = self.build_batch_extraction_prompt(single)
+                content = await self.complete_async(prompt, max_tokens=min(16000, 600 * len(single)))
+                results.update(self.parse_batch_issues(content, list(single)))
+            except Exception as e:
+                logger.error(f"Batched LLM extraction failed for {len(single)} products: {e}")
+            
+            failed = [pid for pid in single if pid not in results]
+            if failed:
+                logger.warning(f"Batched extraction fell back to per-product calls for {len(failed)} products")
+                LLM_FALLBACKS.inc(len(failed), step="batch_extraction", reason="per_product")
         
-        # Check fit issues
-        for descriptor, keywords in size_keywords.items():
-            matches = sum(1 for kw in keywords if kw in combined_text)
-            if matches > 0:
+        missing = [pid for pid in products if pid not in results]
+        if missing:
+            fallback = await asyncio.gather(*(self.extract_issues_llm_async(pid, products[pid]) for pid in missing))
+            results.update(zip(missing, fallback))
+        return results
+    
+    def extract_issues_rule_based(self, product_id: str, feedback: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        """Fallback rule-based extraction over normalized (text, count) pairs.
+
+        Each distinct text is scanned once by RULE_MATCHER; frequency_hint
+        is the share of texts, duplicates included, mentioning a descriptor.
+        """
+        total = feedback_count(feedback)
+        if not total:
+            return []
+        
+        # Texts sharing a label set are counted together
+        label_sets = Counter()
+        for text, count in feedback:
+            label_sets[RULE_MATCHER.match(text)] += count
+        
+        descriptor_texts = Counter()
+        labels_seen = set()
+        for labels, count in label_sets.items():
+            labels_seen |= labels
+            for label in labels:
+                if label[0] in ("fit", "care"):
+                    descriptor_texts[label] += count
+        
+        intensified = ("modifier", "up") in labels_seen
+        softened = ("modifier", "down") in labels_seen
+        
+        # First body area in BODY_AREAS order mentioned anywhere
+        fit_body_area = next((area for area in BODY_AREAS if ("area", area) in labels_seen), "")
+        
+        issues = []
+        for category, keyword_map in (("fit", SIZE_KEYWORDS), ("care", CARE_KEYWORDS)):
+            for descriptor in keyword_map:
+                mentions = descriptor_texts[(category, descriptor)]
+                if not mentions:
+                    continue
+                
                 severity = 3  # Base severity
-                if "very" in combined_text or "extremely" in combined_text:
+                if intensified:
                     severity += 1
-                elif "slightly" in combined_text:
+                elif softened and category == "fit":
                     severity -= 1
                 
-                # Determine body area
-                body_area = ""
-                for area, area_keywords in body_areas.items():
-                    if any(akw in combined_text for akw in area_keywords):
-                        body_area = area
-                        break
+                if category == "fit":
+                    body_area = fit_body_area
+                else:
+                    body_area = "color" if "color" in descriptor else ""
                 
-                frequency = min(100, (matches / len(texts)) * 100)
+                frequency = min(100, (mentions / total) * 100)
                 
                 issues.append({
                     "product_id": product_id,
-                    "issue_category": "fit",
-                    "body_area": body_area,
-                    "descriptor": descriptor,
-                    "severity": max(1, min(5, severity)),
-                    "frequency_hint": int(frequency)
-                })
-        
-        # Check care issues
-        for descriptor, keywords in care_keywords.items():
-            matches = sum(1 for kw in keywords if kw in combined_text)
-            if matches > 0:
-                severity = 3
-                if "very" in combined_text or "extremely" in combined_text:
-                    severity += 1
-                
-                body_area = "color" if "color" in descriptor else ""
-                frequency = min(100, (matches / len(texts)) * 100)
-                
-                issues.append({
-                    "product_id": product_id,
-                    "issue_category": "care",
+                    "issue_category": category,
                     "body_area": body_area,
                     "descriptor": descriptor,
                     "severity": max(1, min(5, severity)),
@@ -155,6 +585,10 @@ Texts:
         
         return issues
     
+    def rule_descriptors(self, text: str) -> List[str]:
+        """Fit and care descriptors the rules find in one normalized text"""
+        return [label[1] for label in RULE_MATCHER.match(text) if label[0] in ("fit", "care")]
+    
     def generate_copy(self, product_id: str, issues: List[Dict[str, Any]]) -> Dict[str, str]:
         """Generate size guidance and care tips"""
         if not issues:
@@ -165,12 +599,32 @@ Texts:
         else:
             return self.generate_copy_rule_based(issues)
     
-    def generate_copy_llm(self, product_id: str, issues: List[Dict[str, Any]]) -> Dict[str, str]:
-        """Generate copy using LLM"""
+    async def generate_copy_async(self, product_id: str, issues: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Async variant of generate_copy"""
+        if not issues:
+            return {"size_guidance": "", "care_tip": ""}
+        
+        if not self.async_client:
+            return self.generate_copy_rule_based(issues)
+        
         try:
-            issues_text = json.dumps(issues, indent=2)
-            
-            prompt = f"""Given these structured fit and care issues for product {product_id}:
+            content = await self.complete_async(self.build_copy_prompt(product_id, issues), max_tokens=500)
+            result = self.parse_copy(content)
+            if result is not None:
+                return result
+            LLM_FALLBACKS.inc(step="copy", reason="unparseable")
+            return self.generate_copy_rule_based(issues)
+                
+        except Exception as e:
+            logger.error(f"LLM copy generation failed for {product_id}: {e}")
+            LLM_FALLBACKS.inc(step="copy", reason="error")
+            return self.generate_copy_rule_based(issues)
+    
+    def build_copy_prompt(self, product_id: str, issues: List[Dict[str, Any]]) -> str:
+        """Prompt asking the LLM for size guidance and a care tip"""
+        issues_text = json.dumps(issues, indent=2)
+        
+        return f"""Given these structured fit and care issues for product {product_id}:
 {issues_text}
 
 Generate concise, helpful copy. Return ONLY JSON with exactly these fields:
@@ -178,28 +632,83 @@ Generate concise, helpful copy. Return ONLY JSON with exactly these fields:
 - care_tip: actionable care instructions (≤200 characters, practical, materials-agnostic)
 
 Be specific and helpful. Don't repeat the product ID."""
+    
+    def parse_copy(self, content: str) -> Optional[Dict[str, str]]:
+        """Pull the copy fields out of an LLM response, or None if absent"""
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if not json_match:
+            return None
+        result = json.loads(json_match.group(0))
+        return {
+            "size_guidance": result.get("size_guidance", "")[:300],
+            "care_tip": result.get("care_tip", "")[:200]
+        }
+    
+    def build_batch_copy_prompt(self, products: Dict[str, List[Dict[str, Any]]]) -> str:
+        """Prompt asking for copy for several products keyed by product_id"""
+        issues_text = json.dumps(products, indent=2)
+        
+        return f"""Given these structured fit and care issues, grouped by product_id:
+{issues_text}
 
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=500
-            )
-            
-            content = response.choices[0].message.content.strip()
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                result = json.loads(json_str)
-                return {
-                    "size_guidance": result.get("size_guidance", "")[:300],
-                    "care_tip": result.get("care_tip", "")[:200]
+Generate concise, helpful copy for each product. Return ONLY a JSON object mapping each product_id to an object with exactly these fields:
+- size_guidance: clear sizing advice (≤300 characters, customer-friendly, neutral tone)  
+- care_tip: actionable care instructions (≤200 characters, practical, materials-agnostic)
+
+Be specific and helpful. Don't repeat the product ID inside the copy."""
+    
+    def parse_batch_copy(self, content: str, product_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """Per-product copy from a keyed batch response; missing products are omitted"""
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if not json_match:
+            return {}
+        parsed = json.loads(json_match.group(0))
+        if not isinstance(parsed, dict):
+            return {}
+        
+        results = {}
+        for product_id in product_ids:
+            copy = parsed.get(product_id)
+            if isinstance(copy, dict):
+                results[product_id] = {
+                    "size_guidance": str(copy.get("size_guidance", ""))[:300],
+                    "care_tip": str(copy.get("care_tip", ""))[:200]
                 }
-            else:
-                return self.generate_copy_rule_based(issues)
+        return results
+    
+    async def generate_copy_batch_async(self, products: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, str]]:
+        """Generate copy for several products in one call, falling back per product"""
+        if len(products) == 1 or not self.async_client:
+            return {pid: await self.generate_copy_async(pid, issues) for pid, issues in products.items()}
+        
+        results = {}
+        try:
+            prompt = self.build_batch_copy_prompt(products)
+            content = await self.complete_async(prompt, max_tokens=min(16000, 200 * len(products)))
+            results = self.parse_batch_copy(content, list(products))
+        except Exception as e:
+            logger.error(f"Batched LLM copy generation failed for {len(products)} products: {e}")
+        
+        missing = [pid for pid in products if pid not in results]
+        if missing:
+            LLM_FALLBACKS.inc(len(missing), step="batch_copy", reason="per_product")
+            fallback = await asyncio.gather(*(self.generate_copy_async(pid, products[pid]) for pid in missing))
+            results.update(zip(missing, fallback))
+        return results
+    
+    def generate_copy_llm(self, product_id: str, issues: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Generate copy using LLM"""
+        try:
+            content = self.complete(self.build_copy_prompt(product_id, issues), max_tokens=500)
+            result = self.parse_copy(content)
+            if result is not None:
+                return result
+            LLM_FALLBACKS.inc(step="copy", reason="unparseable")
+            return self.generate_copy_rule_based(issues)
                 
         except Exception as e:
             logger.error(f"LLM copy generation failed for {product_id}: {e}")
+            LLM_FALLBACKS.inc(step="copy", reason="error")
             return self.generate_copy_rule_based(issues)
     
     def generate_copy_rule_based(self, issues: List[Dict[str, Any]]) -> Dict[str, str]:
@@ -242,4 +751,14 @@ Be specific and helpful. Don't repeat the product ID."""
         return {
             "size_guidance": size_guidance[:300],
             "care_tip": care_tip[:200]
-        }
\ No newline at end of file
+        }
+
+# Rule-only processor for process-pool workers, built on first use in each worker
+_shard_processor: Optional[AIProcessor] = None
+
+def extract_issues_rule_based_shard(shard: List[Tuple[str, List[Tuple[str, int]]]]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Process-pool entry point: rule-based issues for each (product_id, feedback) pair"""
+    global _shard_processor
+    if _shard_processor is None:
+        _shard_processor = AIProcessor()
+    return [(product_id, _shard_processor.extract_issues_rule_based(product_id, feedback)) for product_id, feedback in shard]
@@ -0,0 +1,351 @@
+"""Benchmark the upload -> process -> read pipeline in-process.
+
+Generates a synthetic catalog, drives the FastAPI app through an ASGI
+transport (no server needed) and writes throughput, p50/p99 latency and
+peak RSS per stage to a JSON file. Cold start (import, startup and
+first request in a fresh interpreter) is measured separately. When a
+baseline exists, metrics that
+got worse by more than --tolerance are flagged and the exit code is 1.
+
+    python benchmark.py --products 2000 --reviews-per-product 20
+    python benchmark.py --update-baseline   # record the current numbers
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+from text_utils import collapse_texts
+
+TOKEN = "benchmark"
+
+# Review vocabulary: fit/care phrases the extractors look for, plus filler
+ISSUE_PHRASES = [
+    "runs small", "too tight in the chest", "very snug fit", "sleeves short", "loose and baggy",
+    "oversized", "shrinks after washing", "color faded quickly", "pilling after a week", "seams ripped"
+]
+FILLER_WORDS = (
+    "love this great fabric soft comfortable nice quality would buy again looks good the a and it "
+    "was but for my with very really okay fine ordered usual size arrived quickly"
+).split()
+RETURN_CONDITIONS = ["unused", "worn", "damaged"]
+
+def make_text(rng: random.Random, words: int) -> str:
+    """A review or return reason of about `words` words, usually mentioning one issue"""
+    parts = rng.choices(FILLER_WORDS, k=max(1, words - 3))
+    if rng.random() < 0.7:
+        parts.insert(rng.randrange(len(parts) + 1), rng.choice(ISSUE_PHRASES))
+    return " ".join(parts)
+
+def make_csvs(products: int, reviews_per_product: int, returns_per_product: int, text_words: int, seed: int) -> Tuple[bytes, bytes]:
+    """Synthetic reviews and returns CSVs"""
+    rng = random.Random(seed)
+    reviews, returns = io.StringIO(), io.StringIO()
+    review_writer, return_writer = csv.writer(reviews), csv.writer(returns)
+    review_writer.writerow(["product_id", "review_text", "rating", "date"])
+    return_writer.writerow(["product_id", "return_reason_text", "condition_flag", "date"])
+
+    for index in range(products):
+        product_id = f"P{index:07d}"
+        for n in range(reviews_per_product):
+            review_writer.writerow([product_id, make_text(rng, text_words), rng.randint(1, 5), f"2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}"])
+        for n in range(returns_per_product):
+            return_writer.writerow([product_id, make_text(rng, text_words), rng.choice(RETURN_CONDITIONS), f"2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}"])
+    return reviews.getvalue().encode("utf-8"), returns.getvalue().encode("utf-8")
+
+class FakeCompletions:
+    """Stand-in for the OpenAI chat completions API.
+
+    Answers extraction prompts with the rule-based extractor's issues and
+    copy prompts with fixed text after `latency` seconds, so the LLM path
+    is timed without a network or API key.
+    """
+
+    def __init__(self, processor, latency: float):
+        self.processor = processor
+        self.latency = latency
+        self.calls = 0
+
+    def answer(self, prompt: str) -> str:
+        copy = {"size_guidance": "Consider your usual size.", "care_tip": "Wash cold and hang dry."}
+        if prompt.startswith("Given these structured fit and care issues, grouped by product_id"):
+            products = json.loads(prompt[prompt.index("{"):prompt.rindex("}") + 1])
+            return json.dumps({product_id: copy for product_id in products})
+        if prompt.startswith("Given"):
+            return json.dumps(copy)
+
+        sections = re.split(r"^Product (\S+):$", prompt, flags=re.MULTILINE)
+        if len(sections) > 1:
+            return json.dumps({
+                product_id: self.issues(product_id, body)
+                for product_id, body in zip(sections[1::2], sections[2::2])
+            })
+        return json.dumps(self.issues("", prompt.split("\nTexts:\n", 1)[-1]))
+
+    def issues(self, product_id: str, body: str) -> List[Dict[str, Any]]:
+        texts = []
+        for line in body.splitlines():
+            if line.startswith("- "):
+                # Repeated feedback arrives once with an (xN) count
+                repeated = re.match(r"- (.*) \(x(\d+)\)$", line)
+                texts += [repeated.group(1)] * int(repeated.group(2)) if repeated else [line[2:]]
+        return [
+            {key: value for key, value in issue.items() if key != "product_id"}
+            for issue in self.processor.extract_issues_rule_based(product_id, collapse_texts(texts))
+        ]
+
+    def response(self, prompt: str):
+        self.calls += 1
+        message = SimpleNamespace(content=self.answer(prompt))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return self.response(kwargs["messages"][0]["content"])
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.response(kwargs["messages"][0]["content"])
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+def latency_stats(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+async def time_reads(client, paths: List[str], before_each=None) -> Dict[str, float]:
+    """Issue GETs one after another and summarize their latency"""
+    latencies = []
+    started = time.perf_counter()
+    for path in paths:
+        if before_each:
+            before_each()
+        request_started = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - request_started)
+        response.raise_for_status()
+    return latency_stats(latencies, time.perf_counter() - started)
+
+async def run_process(client, label: str) -> Dict[str, float]:
+    """Run a full /process job and wait for it"""
+    started = time.perf_counter()
+    response = await client.post("/process", params={"incremental": "false"})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] not in ("queued", "running"):
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    if job["status"] != "succeeded":
+        raise RuntimeError(f"{label} job {job['status']}: {job['errors']}")
+    return {
+        "seconds": round(elapsed, 3),
+        "products_per_second": round(job["products_done"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "products_stored": job["result"]["products_processed"],
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+# Run in a fresh interpreter: prints import, startup and first-request times in seconds
+STARTUP_SCRIPT = """
+import asyncio, json, time
+import httpx
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def first_request():
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark") as client:
+            (await client.get("/simple")).raise_for_status()
+        done = time.perf_counter()
+    return ready, done
+
+ready, done = asyncio.run(first_request())
+print(json.dumps([imported - started, ready - imported, done - ready]))
+"""
+
+def run_startup(runs: int, workdir: str) -> Dict[str, float]:
+    """Median cold-start timings over fresh interpreters, each on a new database"""
+    samples = []
+    for run in range(runs):
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(workdir, f'startup-{run}.db')}"}
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT], env=env, check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    import_s, startup_s, first_request_s = (statistics.median(values) for values in zip(*samples))
+    return {
+        "import_ms": round(import_s * 1000, 1),
+        "startup_ms": round(startup_s * 1000, 1),
+        "first_request_ms": round(first_request_s * 1000, 1),
+        "total_ms": round((import_s + startup_s + first_request_s) * 1000, 1),
+        "runs": runs
+    }
+
+async def run_benchmark(args) -> Dict[str, Dict[str, float]]:
+    import httpx
+    import main
+
+    # ASGITransport does not send lifespan events, so run the app's lifespan (schema creation) here
+    async with main.app.router.lifespan_context(main.app):
+        metrics = {}
+        reviews_csv, returns_csv = make_csvs(args.products, args.reviews_per_product, args.returns_per_product, args.text_words, args.seed)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers={"X-Auth-Token": TOKEN}, timeout=None) as client:
+            started = time.perf_counter()
+            response = await client.post("/upload", files={
+                "reviews_csv": ("reviews.csv", reviews_csv, "text/csv"),
+                "returns_csv": ("returns.csv", returns_csv, "text/csv")
+            })
+            response.raise_for_status()
+            elapsed = time.perf_counter() - started
+            rows = response.json()["reviews_uploaded"] + response.json()["returns_uploaded"]
+            metrics["upload"] = {
+                "seconds": round(elapsed, 3),
+                "rows_per_second": round(rows / elapsed, 1),
+                "peak_rss_mb": peak_rss_mb()
+            }
+
+            metrics["process_rule_based"] = await run_process(client, "rule-based")
+
+            if args.llm:
+                processor = main.ai_processor
+                saved = (processor.client, processor.async_client, processor.cache)
+                latency = args.llm_latency_ms / 1000
+                processor.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(processor, latency)))
+                processor.async_client = SimpleNamespace(chat=SimpleNamespace(completions=FakeAsyncCompletions(processor, latency)))
+                processor.cache = None
+                try:
+                    metrics["process_llm_fake"] = await run_process(client, "fake LLM")
+                finally:
+                    processor.client, processor.async_client, processor.cache = saved
+
+            rng = random.Random(args.seed)
+            product_ids = [item["product_id"] for item in (await client.get("/products", params={"limit": 1000, "fields": "product_id"})).json()["items"]]
+            if not product_ids:
+                raise RuntimeError("No products were stored; increase --reviews-per-product")
+            detail_paths = [f"/product/{rng.choice(product_ids)}" for _ in range(args.reads)]
+
+            metrics["read_products"] = await time_reads(client, ["/products"] * args.reads, main.read_cache.clear)
+            metrics["read_products_cached"] = await time_reads(client, ["/products"] * args.reads)
+            metrics["read_product_detail"] = await time_reads(client, detail_paths, main.read_cache.clear)
+            metrics["read_product_detail_cached"] = await time_reads(client, detail_paths)
+
+    return metrics
+
+def lower_is_better(name: str) -> bool:
+    return name in ("seconds", "peak_rss_mb") or name.endswith("_ms")
+
+def find_regressions(metrics: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Describe every timing/throughput metric worse than baseline by more than tolerance"""
+    regressions = []
+    for stage, values in metrics.items():
+        for name, value in values.items():
+            previous = baseline.get(stage, {}).get(name)
+            if not previous or name in ("requests", "products_stored", "runs"):
+                continue
+            change = (value - previous) / previous
+            worse = change > tolerance if lower_is_better(name) else -change > tolerance
+            if worse:
+                regressions.append(f"{stage}.{name}: {previous} -> {value} ({change:+.0%})")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark upload, process and read endpoints in-process")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--reviews-per-product", type=int, default=20)
+    parser.add_argument("--returns-per-product", type=int, default=5)
+    parser.add_argument("--text-words", type=int, default=15, help="approximate words per review/return text")
+    parser.add_argument("--reads", type=int, default=200, help="requests per read benchmark")
+    parser.add_argument("--no-llm", dest="llm", action="store_false", help="skip the fake-LLM /process run")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0, help="simulated latency per LLM call")
+    parser.add_argument("--llm-rpm", type=int, default=10**9, help="client-side request limit for the fake LLM run (default: unlimited)")
+    parser.add_argument("--llm-tpm", type=int, default=10**9, help="client-side token limit for the fake LLM run (default: unlimited)")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters timed for cold start (0 to skip)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--update-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    return parser.parse_args()
+
+def main_cli():
+    args = parse_args()
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "update_baseline", "tolerance")}
+
+    # Point the app at a throwaway database before it is imported
+    workdir = tempfile.mkdtemp(prefix="fitloop-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["AUTH_TOKEN"] = TOKEN
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.llm_rpm)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.llm_tpm)
+    os.environ.pop("OPENAI_API_KEY", None)
+
+    metrics = {}
+    if args.startup_runs:
+        metrics["startup"] = run_startup(args.startup_runs, workdir)
+    metrics.update(asyncio.run(run_benchmark(args)))
+    results = {"config": config, "python": sys.version.split()[0], "cpus": os.cpu_count(), "metrics": metrics}
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(metrics, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print("Warning: baseline was recorded with a different configuration; comparison may be meaningless")
+
+    regressions = find_regressions(metrics, baseline.get("metrics", {}), args.tolerance)
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,6 +1,27 @@
 import csv
 import io
-from typing import Dict, List
+import gzip
+from collections import deque
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import islice
+from types import SimpleNamespace
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional; needed for .csv.zst uploads
+    zstandard = None
+
+# Rows handed to the database per executemany batch
+DEFAULT_BATCH_SIZE = 5000
+
+# Leading bytes identifying each supported upload format
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
 
 def read_csv_from_string(csv_content: str) -> List[Dict]:
     """Read CSV content from string and return list of dictionaries"""
@@ -11,6 +32,179 @@ def read_csv_from_string(csv_content: str) -> List[Dict]:
         print(f"Error reading CSV: {e}")
         return []
 
+def open_csv_stream(fileobj: BinaryIO, required_cols: List[str], label: str = "CSV") -> csv.DictReader:
+    """Wrap a binary file object in a streaming DictReader and validate its header.
+
+    Only the header line is read here; rows are decoded lazily as the
+    reader is iterated, so memory stays flat regardless of file size.
+    Short rows are padded with empty strings.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""), restval="")
+    if not reader.fieldnames:
+        raise ValueError(f"{label} is empty")
+
+    missing_cols = [col for col in required_cols if col not in reader.fieldnames]
+    if missing_cols:
+        raise ValueError(f"{label} missing required columns: {missing_cols}")
+
+    return reader
+
+def detect_upload_format(fileobj: BinaryIO) -> str:
+    """Sniff an upload's format from its first bytes: csv, gzip, zstd, parquet or arrow"""
+    head = fileobj.read(8)
+    fileobj.seek(0)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    if head.startswith(PARQUET_MAGIC):
+        return "parquet"
+    if head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_MAGIC):
+        return "arrow"
+    return "csv"
+
+@lru_cache(maxsize=None)
+def load_arrow() -> Optional[SimpleNamespace]:
+    """pyarrow modules, imported on the first upload; None when pyarrow is not installed.
+
+    Importing pyarrow takes a good part of the app's startup time, and
+    only uploads need it.
+    """
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError:  # optional; needed for Parquet/Arrow uploads, speeds up CSV
+        return None
+    return SimpleNamespace(pa=pyarrow, pc=pyarrow.compute, csv=pyarrow.csv, pq=pyarrow.parquet)
+
+def iter_arrow_rows(batches: Iterable, columns: List[str]) -> Iterator[Dict[str, str]]:
+    """Rows of the given columns from Arrow record batches, as strings like csv.DictReader's.
+
+    Each column is cast and null-filled in one vectorized step per batch;
+    only the final per-row dicts are built in Python.
+    """
+    arrow = load_arrow()
+    for batch in batches:
+        arrays = [arrow.pc.fill_null(batch.column(name).cast(arrow.pa.string()), "").to_pylist() for name in columns]
+        for values in zip(*arrays):
+            yield dict(zip(columns, values))
+
+def check_columns(names: List[str], required_cols: List[str], label: str):
+    """Raise ValueError naming any required column missing from a file's schema"""
+    missing_cols = [col for col in required_cols if col not in names]
+    if missing_cols:
+        raise ValueError(f"{label} missing required columns: {missing_cols}")
+
+def read_csv_header(fileobj: BinaryIO) -> List[str]:
+    """Column names of a CSV without consuming it (fileobj must be seekable or peekable)"""
+    if fileobj.seekable():
+        head = fileobj.read(64 * 1024)
+        fileobj.seek(0)
+    else:
+        head = fileobj.peek(64 * 1024)
+    return next(csv.reader(io.StringIO(head.decode("utf-8-sig", errors="replace"))), [])
+
+def open_arrow_csv_stream(fileobj: BinaryIO, required_cols: List[str], label: str = "CSV") -> Iterator[Dict[str, str]]:
+    """Stream a CSV through pyarrow's multithreaded block parser, converting only the required columns.
+
+    pyarrow rejects rows with too few or too many fields, which
+    csv.DictReader accepts; those rows are re-read with the csv module,
+    padded with empty strings or cut to the header, and yielded after the
+    batch they were found in.
+    """
+    header = read_csv_header(fileobj)
+    if not header:
+        raise ValueError(f"{label} is empty")
+    check_columns(header, required_cols, label)
+    arrow = load_arrow()
+    ragged = deque()
+
+    def read_ragged_row(row) -> str:
+        # Called from pyarrow's parser threads; deque appends are thread-safe
+        values = next(csv.reader(io.StringIO(row.text)), [])
+        record = dict(zip(header, values))
+        ragged.append({col: record.get(col, "") for col in required_cols})
+        return "skip"
+
+    try:
+        reader = arrow.csv.open_csv(
+            fileobj,
+            read_options=arrow.csv.ReadOptions(block_size=4 * 1024 * 1024),
+            parse_options=arrow.csv.ParseOptions(newlines_in_values=True, invalid_row_handler=read_ragged_row),
+            convert_options=arrow.csv.ConvertOptions(
+                include_columns=required_cols,
+                column_types={col: arrow.pa.string() for col in required_cols},
+                strings_can_be_null=False
+            )
+        )
+    except arrow.pa.ArrowInvalid as e:
+        raise ValueError(f"{label} could not be parsed: {e}")
+
+    def rows() -> Iterator[Dict[str, str]]:
+        for batch in reader:
+            yield from iter_arrow_rows((batch,), required_cols)
+            while ragged:
+                yield ragged.popleft()
+        while ragged:
+            yield ragged.popleft()
+
+    return rows()
+
+def open_upload_stream(fileobj: BinaryIO, required_cols: List[str], label: str = "CSV") -> Iterable[Dict[str, str]]:
+    """Rows of an uploaded CSV (plain, gzip or zstd), Parquet or Arrow IPC file.
+
+    The format is detected from the file's magic bytes. The header or
+    schema is validated against required_cols before returning; rows are
+    then read lazily in batches. Columnar files only have their required
+    columns read.
+    """
+    upload_format = detect_upload_format(fileobj)
+    if upload_format == "gzip":
+        fileobj = gzip.GzipFile(fileobj=fileobj, mode="rb")
+    elif upload_format == "zstd":
+        if zstandard is None:
+            raise ValueError(f"{label} is zstd-compressed; install zstandard to upload it")
+        # Buffered so the header can be peeked at without a seek
+        fileobj = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(fileobj), 1024 * 1024)
+
+    arrow = load_arrow()
+    if upload_format in ("parquet", "arrow"):
+        if arrow is None:
+            raise ValueError(f"{label} is a {upload_format.title()} file; install pyarrow to upload it")
+        try:
+            if upload_format == "parquet":
+                parquet_file = arrow.pq.ParquetFile(fileobj)
+                check_columns(parquet_file.schema_arrow.names, required_cols, label)
+                batches = parquet_file.iter_batches(batch_size=DEFAULT_BATCH_SIZE, columns=required_cols)
+            elif fileobj.read(6) == ARROW_FILE_MAGIC:
+                fileobj.seek(0)
+                reader = arrow.pa.ipc.open_file(fileobj)
+                check_columns(reader.schema.names, required_cols, label)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            else:
+                fileobj.seek(0)
+                reader = arrow.pa.ipc.open_stream(fileobj)
+                check_columns(reader.schema.names, required_cols, label)
+                batches = reader
+        except arrow.pa.ArrowException as e:
+            raise ValueError(f"{label} could not be read: {e}")
+        return iter_arrow_rows(batches, required_cols)
+
+    if arrow is not None:
+        return open_arrow_csv_stream(fileobj, required_cols, label)
+    return open_csv_stream(fileobj, required_cols, label)
+
+def iter_batches(rows: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """Yield lists of at most batch_size rows from any row iterable"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 def safe_float(value: str, default: float = 0.0) -> float:
     """Safely convert string to float"""
     try:
@@ -23,4 +217,23 @@ def safe_int(value: str, default: int = 0) -> int:
     try:
         return int(value)
     except (ValueError, TypeError):
-        return default
\ No newline at end of file
+        return default
+
+# Non-ISO date layouts accepted in uploads, tried in order (US month-first before day-first)
+DATE_FORMATS = ("%m/%d/%Y", "%Y/%m/%d", "%d.%m.%Y", "%d/%m/%Y", "%b %d, %Y", "%d %b %Y")
+
+def safe_date(value: str) -> Optional[date]:
+    """Parse a free-form date string (ISO dates and timestamps included), or None if unrecognized"""
+    text = str(value or "").strip()
+    if not text:
+        return None
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
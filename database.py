@@ -1,13 +1,66 @@
-from sqlalchemy import create_engine, Column, String, Integer, Float, Text, DateTime
+from sqlalchemy import create_engine, event, bindparam, func, select, Column, String, Integer, Float, Text, Date, DateTime, LargeBinary, Index, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, relationship, deferred
 import datetime
+import os
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./fitloop.db"
+from text_utils import normalize_text, text_hash
+from csv_utils import safe_date
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fitloop.db")
+
+# Some hosts still hand out the pre-1.4 postgres:// scheme
+if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
+    SQLALCHEMY_DATABASE_URL = "postgresql://" + SQLALCHEMY_DATABASE_URL[len("postgres://"):]
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite tuning: WAL lets readers run alongside a writer"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}")
+    # Negative cache_size is in KiB
+    cursor.execute(f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_KB', str(64 * 1024)))}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL) -> Engine:
+    """Build the engine for url with a sized connection pool.
+
+    SQLite files get WAL journaling and a busy timeout so dashboard reads
+    keep working during a /process write; in-memory SQLite shares a single
+    connection (StaticPool); other databases (e.g. Postgres)
+    get a pre-pinged QueuePool sized by DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    
+    if url.startswith("sqlite"):
+        connect_args = {
+            "check_same_thread": False,
+            "timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+        }
+        parsed = make_url(url)
+        if parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory":
+            # An in-memory database lives in its one connection, so every session shares it
+            engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+        else:
+            engine = create_engine(url, connect_args=connect_args, pool_size=pool_size, max_overflow=max_overflow)
+        event.listen(engine, "connect", set_sqlite_pragmas)
+        return engine
+    
+    return create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=True
+    )
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -20,6 +73,24 @@ class Review(Base):
     review_text = Column(Text)
     rating = Column(Integer)
     date = Column(String)
+    # Canonical text and its hash, computed once at upload; /process groups on the hash
+    normalized_text = Column(Text)
+    text_hash = Column(String)
+    # date parsed at upload; NULL when the string is not a recognizable date
+    feedback_date = Column(Date)
+    # Hash of the raw text (Postgres btree entries are capped at ~2.7 KB, too small for a
+    # long review), and how many identical rows precede this one in its upload
+    raw_hash = Column(String)
+    occurrence = Column(Integer)
+
+    # Rows sharing these columns are the same piece of feedback; repeats of one text keep their own rows
+    natural_key = ("product_id", "raw_hash", "date", "occurrence")
+    text_column = "review_text"
+    __table_args__ = (
+        Index("uq_reviews_natural_key", *natural_key, unique=True),
+        Index("ix_reviews_product_text_hash", "product_id", "text_hash"),
+        Index("ix_reviews_product_date", "product_id", "feedback_date"),
+    )
 
 class Return(Base):
     __tablename__ = "returns"
@@ -29,6 +100,19 @@ class Return(Base):
     return_reason_text = Column(Text)
     condition_flag = Column(String)
     date = Column(String)
+    normalized_text = Column(Text)
+    text_hash = Column(String)
+    feedback_date = Column(Date)
+    raw_hash = Column(String)
+    occurrence = Column(Integer)
+
+    natural_key = ("product_id", "raw_hash", "date", "occurrence")
+    text_column = "return_reason_text"
+    __table_args__ = (
+        Index("uq_returns_natural_key", *natural_key, unique=True),
+        Index("ix_returns_product_text_hash", "product_id", "text_hash"),
+        Index("ix_returns_product_date", "product_id", "feedback_date"),
+    )
 
 class Issue(Base):
     __tablename__ = "issues"
@@ -48,6 +132,23 @@ class Product(Base):
     risk_score = Column(Float)
     top_issue_descriptor = Column(String)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # JSON rendered by /process: the /product/{id} payload and the /products list item.
+    # Deferred so entity loads skip them; NULL for rows stored before they existed
+    detail_json = deferred(Column(LargeBinary))
+    summary_json = deferred(Column(LargeBinary))
+
+    # Derived rows share product_id but have no foreign key; these are read-only views
+    issues = relationship(
+        "Issue", primaryjoin="Product.product_id == foreign(Issue.product_id)",
+        order_by="Issue.id", viewonly=True
+    )
+    generated_copy = relationship(
+        "GeneratedCopy", primaryjoin="Product.product_id == foreign(GeneratedCopy.product_id)",
+        uselist=False, viewonly=True
+    )
+
+    # Matches the /products listing order so keyset pages are index range scans
+    __table_args__ = (Index("ix_products_risk_product", risk_score.desc(), product_id),)
 
 class GeneratedCopy(Base):
     __tablename__ = "generated_copy"
@@ -57,12 +158,186 @@ class GeneratedCopy(Base):
     care_tip = Column(Text)
     generated_at = Column(DateTime, default=datetime.datetime.utcnow)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+class ProductFingerprint(Base):
+    __tablename__ = "product_fingerprints"
+    
+    product_id = Column(String, primary_key=True, index=True)
+    content_hash = Column(String)
+    # AIProcessor.extractor at the time; a product is re-analyzed when it no longer matches
+    extractor = Column(String)
+    processed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class DailyFeedback(Base):
+    """Reviews plus returns per product per day; the denominator for issue trends"""
+    __tablename__ = "daily_feedback"
+    
+    product_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    texts = Column(Integer)
+
+class DailyIssueHits(Base):
+    """Feedback texts mentioning a descriptor per product per day, rebuilt by /process"""
+    __tablename__ = "daily_issue_hits"
+    
+    product_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    descriptor = Column(String, primary_key=True)
+    hits = Column(Integer)
+
+class DescriptorCluster(Base):
+    """Issue descriptor -> canonical descriptor it was merged into; kept across /process runs"""
+    __tablename__ = "descriptor_clusters"
+    
+    descriptor = Column(String, primary_key=True)
+    canonical = Column(String, index=True)
+    # 1.0 (new clusters and spelling normalizations); keyword and n-gram similarity merges
+    # are not stored, and NULL or lower values left by earlier versions are ignored
+    similarity = Column(Float)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    natural_key = ("descriptor",)
+
+class DirtyProduct(Base):
+    __tablename__ = "dirty_products"
+    
+    product_id = Column(String, primary_key=True, index=True)
+    marked_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    natural_key = ("product_id",)
+
+def normalized_columns(raw_text: str) -> dict:
+    """normalized_text and text_hash values for a review or return text"""
+    normalized = normalize_text(raw_text)
+    return {"normalized_text": normalized, "text_hash": text_hash(normalized)}
+
+def raw_hash_columns(raw_text: str) -> dict:
+    """raw_hash value for a review or return text"""
+    return {"raw_hash": text_hash(raw_text)}
+
+def date_columns(raw_date: str) -> dict:
+    """feedback_date value for a review or return date string"""
+    return {"feedback_date": safe_date(raw_date)}
+
+def backfill_columns(conn, model, source: str, compute, batch_size: int = 5000):
+    """Fill derived columns for rows stored before those columns existed.
+
+    compute maps the source column's value to a dict of new column values.
+    Rows are walked by id, so rows whose derived value is NULL (an
+    unparseable date) are not revisited.
+    """
+    table = model.__table__
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            table.select().with_only_columns(table.c.id, table.c[source])
+            .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        conn.execute(
+            table.update().where(table.c.id == bindparam("row_id")),
+            [{"row_id": row_id, **compute(value or "")} for row_id, value in rows]
+        )
+        last_id = rows[-1][0]
+
+def number_occurrences(conn, model, batch_size: int = 5000):
+    """Set occurrence on rows stored before it existed: 0, or the repeat number in id order"""
+    table = model.__table__
+    conn.execute(table.update().values(occurrence=0))
+    key = [table.c[name] for name in model.natural_key if name != "occurrence"]
+    repeated = conn.execute(
+        table.select().with_only_columns(*key).group_by(*key).having(func.count() > 1)
+    ).all()
+    updates = []
+    for values in repeated:
+        ids = conn.execute(
+            table.select().with_only_columns(table.c.id)
+            .where(*[column == value for column, value in zip(key, values)]).order_by(table.c.id)
+        ).scalars().all()
+        updates.extend({"row_id": row_id, "occurrence": number} for number, row_id in enumerate(ids))
+        if len(updates) >= batch_size:
+            conn.execute(table.update().where(table.c.id == bindparam("row_id")), updates)
+            updates = []
+    if updates:
+        conn.execute(table.update().where(table.c.id == bindparam("row_id")), updates)
+
+def migrate_schema():
+    """Bring tables created by older versions up to the current columns and indexes.
+
+    create_all only builds new tables, so missing columns are added (and
+    backfilled) here, then missing indexes. An index whose columns have
+    changed since it was built is dropped and rebuilt. Rows are never
+    deleted: if existing rows break a unique index, the migration fails.
+    """
+    existing = inspect(engine)
+    with engine.begin() as conn:
+        for model in (Review, Return, Product, ProductFingerprint):
+            table = model.__table__
+            column_names = {column["name"] for column in existing.get_columns(table.name)}
+            added = [column for column in table.columns if column.name not in column_names]
+            for column in added:
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                ))
+            added_names = {column.name for column in added}
+            if "text_hash" in added_names:
+                backfill_columns(conn, model, model.text_column, normalized_columns)
+            if "feedback_date" in added_names:
+                backfill_columns(conn, model, "date", date_columns)
+            if "raw_hash" in added_names:
+                backfill_columns(conn, model, model.text_column, raw_hash_columns)
+            if "occurrence" in added_names:
+                number_occurrences(conn, model)
+
+            index_columns = {index["name"]: index["column_names"] for index in existing.get_indexes(table.name)}
+            for index in table.indexes:
+                if index_columns.get(index.name) == index.columns.keys():
+                    continue
+                if index.name in index_columns:
+                    index.drop(bind=conn)
+                if index.unique:
+                    duplicates = conn.execute(
+                        select(func.count()).select_from(table).group_by(*index.columns)
+                        .having(func.count() > 1).limit(1)
+                    ).first()
+                    if duplicates:
+                        raise RuntimeError(
+                            f"Cannot add unique index {index.name}: {table.name} has rows sharing "
+                            f"{', '.join(index.columns.keys())}; resolve them and rerun the migration"
+                        )
+                index.create(bind=conn)
+
+def dedup_insert(model, update_columns=()):
+    """INSERT for a model with a natural key that skips or updates duplicates"""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    stmt = dialect_insert(model.__table__)
+    if update_columns:
+        return stmt.on_conflict_do_update(
+            index_elements=list(model.natural_key),
+            set_={col: stmt.excluded[col] for col in update_columns}
+        )
+    return stmt.on_conflict_do_nothing(index_elements=list(model.natural_key))
+
+def init_db():
+    """Create missing tables and migrate older ones.
+
+    Run once per deploy or at app startup (DB_INIT_ON_STARTUP) rather than
+    on import, so importing the app (workers, scripts, tests) stays cheap.
+    """
+    Base.metadata.create_all(bind=engine)
+    migrate_schema()
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+if __name__ == "__main__":
+    # Release step: python database.py
+    init_db()
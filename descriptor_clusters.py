@@ -0,0 +1,174 @@
+import re
+import zlib
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+# Hashed character n-gram space; collisions are rare at the few hundred descriptors a catalog has
+VECTOR_DIMENSIONS = 4096
+NGRAM_SIZES = (2, 3, 4)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+# Inflections and filler words ignored when comparing descriptor tokens (sleeves/sleeve, fading/fade)
+_SUFFIXES = ("ing", "ed", "es", "s", "e")
+_STOPWORDS = {"a", "an", "the", "too", "very", "in", "on", "at", "of", "and", "is"}
+
+def canonical_form(descriptor: str) -> str:
+    """snake_case form of an LLM descriptor ("Runs small " -> "runs_small")"""
+    return _NON_WORD.sub("_", (descriptor or "").lower()).strip("_")
+
+def token_stems(form: str) -> frozenset:
+    """Tokens of a canonical form, minus filler words, with plural and -ing/-ed endings removed"""
+    stems = set()
+    for token in form.split("_"):
+        if token in _STOPWORDS:
+            continue
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                token = token[:-len(suffix)]
+                break
+        stems.add(token)
+    return frozenset(stems)
+
+def descriptor_vector(descriptor: str) -> np.ndarray:
+    """Unit-length hashed character n-gram counts of a descriptor.
+
+    crc32 rather than hash() keeps buckets stable across processes, so
+    persisted mappings mean the same thing on every worker.
+    """
+    vector = np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+    padded = f"_{descriptor}_"
+    for size in NGRAM_SIZES:
+        for start in range(len(padded) - size + 1):
+            vector[zlib.crc32(padded[start:start + size].encode("utf-8")) % VECTOR_DIMENSIONS] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class DescriptorIndex:
+    """Maps issue descriptors to canonical cluster names, offline.
+
+    A descriptor resolves, in order, to the rule descriptor of its issue
+    category that has a keyword with exactly its words (too_tight ->
+    runs_small for a fit issue, but never loose_threads -> runs_large);
+    to a known descriptor; to a canonical descriptor with the same tokens
+    up to inflection and order (sleeves_short, short_sleeve ->
+    sleeve_short), found by cosine similarity of character n-gram
+    vectors at or above threshold; otherwise to a cluster of its own.
+    Seeds are always canonical, so rule descriptors never merge with each
+    other.
+
+    Keyword and similarity merges can still be wrong, so they are kept in
+    memory only and redone on each start. New clusters and spelling
+    normalizations are listed by pending() until mark_saved().
+    """
+
+    def __init__(
+        self,
+        seeds: Iterable[str],
+        keywords: Optional[Mapping[Tuple[str, str], Iterable[str]]] = None,
+        threshold: float = 0.7
+    ):
+        self.threshold = threshold
+        self.mapping: Dict[str, str] = {}
+        # (issue category, token stems of a keyword) -> rule descriptors it names
+        self._keywords: Dict[Tuple[str, frozenset], Set[str]] = defaultdict(set)
+        for (category, rule_descriptor), phrases in (keywords or {}).items():
+            for phrase in phrases:
+                self._keywords[(category, token_stems(canonical_form(phrase)))].add(rule_descriptor)
+        self._canonicals: List[str] = []
+        self._stems: List[frozenset] = []
+        self._vectors = np.zeros((16, VECTOR_DIMENSIONS), dtype=np.float32)
+        # (descriptor, issue category) -> canonical, for every descriptor resolved so far
+        self._resolved: Dict[Tuple[str, Optional[str]], str] = {}
+        # New clusters and spelling normalizations not yet saved
+        self._unsaved: Set[str] = set()
+        # Descriptors merged on similarity alone (never saved)
+        self._similar: Set[str] = set()
+        self._lock = threading.Lock()
+        for seed in seeds:
+            self.mapping[seed] = seed
+            self._add_canonical(seed)
+
+    def _add_canonical(self, descriptor: str):
+        if len(self._canonicals) == len(self._vectors):
+            self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+        self._vectors[len(self._canonicals)] = descriptor_vector(descriptor)
+        self._canonicals.append(descriptor)
+        self._stems.append(token_stems(descriptor))
+
+    def update(self, rows: Iterable[Tuple[str, str]]):
+        """Adopt (descriptor, canonical) pairs persisted by any worker"""
+        with self._lock:
+            for descriptor, canonical in rows:
+                if canonical not in self.mapping:
+                    self.mapping[canonical] = canonical
+                    self._add_canonical(canonical)
+                self.mapping[descriptor] = canonical
+                self._unsaved.discard(descriptor)
+                self._similar.discard(descriptor)
+            self._resolved.clear()
+
+    def canonical(self, descriptor: str, category: Optional[str] = None) -> str:
+        """Canonical name of descriptor's cluster within category, assigning one on first sight"""
+        canonical = self._resolved.get((descriptor, category))
+        if canonical is not None:
+            return canonical
+
+        with self._lock:
+            form = canonical_form(descriptor)
+            canonical = self._keyword_match(form, category) or self._resolve(descriptor, form)
+            self._resolved[(descriptor, category)] = canonical
+            return canonical
+
+    def _keyword_match(self, form: str, category: Optional[str]) -> Optional[str]:
+        """The one rule descriptor of category with a keyword made of exactly form's words"""
+        found = self._keywords.get((category, token_stems(form)), ())
+        return next(iter(found)) if len(found) == 1 else None
+
+    def _resolve(self, descriptor: str, form: str) -> str:
+        canonical = self.mapping.get(descriptor)
+        if canonical is not None:
+            return canonical
+        canonical = self.mapping.get(form)
+        similar = form in self._similar
+        if canonical is None and form:
+            canonical = self._nearest(form)
+            similar = canonical is not None
+        if canonical is None:
+            canonical = form or descriptor
+            if canonical not in self.mapping:
+                self.mapping[canonical] = canonical
+                self._add_canonical(canonical)
+                self._unsaved.add(canonical)
+        if descriptor != canonical:
+            self.mapping[descriptor] = canonical
+            if similar:
+                self._similar.add(descriptor)
+            else:
+                self._unsaved.add(descriptor)
+        return canonical
+
+    def _nearest(self, form: str) -> Optional[str]:
+        """Most similar canonical descriptor at or above the threshold with the same token stems"""
+        if not self._canonicals:
+            return None
+        similarities = self._vectors[:len(self._canonicals)] @ descriptor_vector(form)
+        stems = token_stems(form)
+        candidates = np.flatnonzero(similarities >= self.threshold)
+        for index in candidates[np.argsort(-similarities[candidates], kind="stable")]:
+            # Similar spelling alone is not enough: fabric_thick must not join fabric_thin
+            if self._stems[index] == stems:
+                return self._canonicals[index]
+        return None
+
+    def pending(self) -> List[Tuple[str, str]]:
+        """(descriptor, canonical) mappings not saved yet"""
+        with self._lock:
+            return [(descriptor, self.mapping[descriptor]) for descriptor in self._unsaved]
+
+    def mark_saved(self, descriptors: Iterable[str]):
+        with self._lock:
+            self._unsaved.difference_update(descriptors)
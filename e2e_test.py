@@ -27,13 +27,20 @@ with open(reviews_path, 'rb') as rv, open(returns_path, 'rb') as rt:
 print("== Processing ==")
 r3 = requests.post(f"{BASE}/process", headers=HEADERS)
 print(r3.status_code, r3.json())
+job_id = r3.json().get('job_id')
+while job_id:
+    job = requests.get(f"{BASE}/jobs/{job_id}", headers=HEADERS).json()
+    if job['status'] not in ('queued', 'running'):
+        print(job['status'], job['result'], job['errors'])
+        break
+    time.sleep(1)
 
 print("== Products ==")
 r4 = requests.get(f"{BASE}/products", headers=HEADERS)
 print(r4.status_code, r4.json())
 
-if r4.ok and r4.json():
-    pid = r4.json()[0]['product_id']
+if r4.ok and r4.json()['items']:
+    pid = r4.json()['items'][0]['product_id']
     print(f"== Product Detail {pid} ==")
     r5 = requests.get(f"{BASE}/product/{pid}", headers=HEADERS)
     print(r5.status_code, list(r5.json().keys()))
@@ -0,0 +1,108 @@
+import io
+import csv
+import json
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator
+
+# Formats the bulk /export endpoint can stream: media type and file extension
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "markdown": ("application/zip", "zip")
+}
+
+# One CSV row per issue; products without issues get a single row with blank issue columns
+CSV_COLUMNS = [
+    "product_id", "risk_score", "top_issue_descriptor", "updated_at", "size_guidance", "care_tip",
+    "issue_category", "body_area", "descriptor", "severity", "frequency_pct"
+]
+
+def render_markdown(product_data: Dict[str, Any]) -> str:
+    """Markdown report for a product detail payload"""
+    copy = product_data['generated_copy']
+    lines = [
+        f"# Product {product_data['product_id']}",
+        "",
+        f"**Risk Score:** {product_data['risk_score']}",
+        "",
+        "## Size Guidance",
+        copy['size_guidance'] or 'No guidance available',
+        "",
+        "## Care Tip",
+        copy['care_tip'] or 'No care tips available',
+        "",
+        "## Issues Summary",
+        "",
+        "| Descriptor | Category | Body Area | Frequency % | Severity |",
+        "|------------|----------|-----------|-------------|----------|"
+    ]
+    lines.extend(
+        f"| {issue['descriptor']} | {issue['issue_category']} | {issue['body_area']} | {issue['frequency_pct']}% | {issue['severity']} |"
+        for issue in product_data['issues']
+    )
+    if not product_data['issues']:
+        lines.append("| No issues found | - | - | - | - |")
+    lines.extend(["", "---", f"*Generated at: {datetime.utcnow().isoformat()}*"])
+    return "\n".join(lines)
+
+def iter_ndjson(details: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """One JSON document per product per line"""
+    for product_data in details:
+        yield json.dumps(product_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def iter_csv(details: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Flat CSV with the product's columns repeated on each of its issue rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for product_data in details:
+        product_row = {
+            **product_data,
+            "size_guidance": product_data["generated_copy"]["size_guidance"],
+            "care_tip": product_data["generated_copy"]["care_tip"]
+        }
+        writer.writerows([{**product_row, **issue} for issue in product_data["issues"]] or [product_row])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def iter_markdown_zip(details: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Zip archive with one Markdown report per product, streamed file by file.
+
+    Only the archive's central directory (a small record per file) is
+    held until the end; each report is sent as soon as it is compressed.
+    """
+    sink = _ChunkSink()
+    # An unseekable target makes zipfile write sizes after each entry instead of seeking back
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for product_data in details:
+            archive.writestr(f"product_{product_data['product_id']}_analysis.md", render_markdown(product_data))
+            yield sink.drain()
+    yield sink.drain()
+
+def stream_export(details: Iterable[Dict[str, Any]], export_format: str) -> Iterator[bytes]:
+    """Encode product detail payloads in one of EXPORT_FORMATS"""
+    if export_format == "ndjson":
+        return iter_ndjson(details)
+    if export_format == "csv":
+        return iter_csv(details)
+    return iter_markdown_zip(details)
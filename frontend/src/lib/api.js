@@ -53,6 +53,17 @@ class ApiClient {
       body,
     });
   }
+
+  // Poll a background job until it succeeds, fails or is cancelled
+  async waitForJob(jobId, intervalMs = 1000) {
+    for (;;) {
+      const job = await this.get(`/jobs/${jobId}`);
+      if (['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+        return job;
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  }
 }
 
 export const api = new ApiClient();
\ No newline at end of file
@@ -4,21 +4,40 @@ import toast from 'react-hot-toast';
 import { api } from '../lib/api';
 import LoadingSpinner from '../components/LoadingSpinner';
 
+const PAGE_SIZE = 100;
+
 const Dashboard = () => {
   const [products, setProducts] = useState([]);
+  const [summary, setSummary] = useState({ total: 0, high_risk: 0, low_risk: 0 });
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [filterCategory, setFilterCategory] = useState('all');
 
+  // Filtering happens server-side; debounce typing so each keystroke isn't a request
   useEffect(() => {
-    fetchProducts();
-  }, []);
+    const timer = setTimeout(fetchProducts, 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm, filterCategory]);
+
+  const productsQuery = (cursor) => {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (searchTerm) params.set('search', searchTerm);
+    if (filterCategory !== 'all') params.set('top_issue', filterCategory);
+    if (cursor) params.set('cursor', cursor);
+    return `/products?${params}`;
+  };
 
   const fetchProducts = async () => {
     try {
-      setLoading(true);
-      const data = await api.get('/products');
-      setProducts(data);
+      const [page, counts] = await Promise.all([
+        api.get(productsQuery()),
+        api.get('/products/summary'),
+      ]);
+      setProducts(page.items);
+      setNextCursor(page.next_cursor);
+      setSummary(counts);
     } catch (error) {
       console.error('Failed to fetch products:', error);
       toast.error('Failed to load products. Please try again.');
@@ -27,15 +46,19 @@ const Dashboard = () => {
     }
   };
 
-  const filteredProducts = products.filter(product => {
-    const matchesSearch = product.product_id.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         product.top_issue_descriptor.toLowerCase().includes(searchTerm.toLowerCase());
-    
-    const matchesCategory = filterCategory === 'all' || 
-                           product.top_issue_descriptor.includes(filterCategory);
-    
-    return matchesSearch && matchesCategory;
-  });
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await api.get(productsQuery(nextCursor));
+      setProducts(current => [...current, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error('Failed to fetch more products:', error);
+      toast.error('Failed to load more products. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const getRiskColor = (riskScore) => {
     if (riskScore >= 0.7) return 'text-red-600 bg-red-50';
@@ -106,25 +129,25 @@ const Dashboard = () => {
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6 mb-6">
         <div className="bg-white rounded-lg shadow-sm p-6">
           <h3 className="text-lg font-medium text-gray-900 mb-2">Total Products</h3>
-          <p className="text-3xl font-bold text-blue-600">{products.length}</p>
+          <p className="text-3xl font-bold text-blue-600">{summary.total}</p>
         </div>
         <div className="bg-white rounded-lg shadow-sm p-6">
           <h3 className="text-lg font-medium text-gray-900 mb-2">High Risk</h3>
           <p className="text-3xl font-bold text-red-600">
-            {products.filter(p => p.risk_score >= 0.7).length}
+            {summary.high_risk}
           </p>
         </div>
         <div className="bg-white rounded-lg shadow-sm p-6">
           <h3 className="text-lg font-medium text-gray-900 mb-2">Low Risk</h3>
           <p className="text-3xl font-bold text-green-600">
-            {products.filter(p => p.risk_score < 0.4).length}
+            {summary.low_risk}
           </p>
         </div>
       </div>
 
       {/* Products Table */}
       <div className="bg-white rounded-lg shadow-sm overflow-hidden">
-        {filteredProducts.length === 0 ? (
+        {products.length === 0 ? (
           <div className="p-12 text-center">
             <div className="text-gray-400 mb-4">
               <svg className="mx-auto h-16 w-16" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -133,12 +156,12 @@ const Dashboard = () => {
             </div>
             <h3 className="text-lg font-medium text-gray-900 mb-2">No products found</h3>
             <p className="text-gray-600 mb-4">
-              {products.length === 0 
+              {summary.total === 0
                 ? "No products have been processed yet." 
                 : "No products match your current filters."
               }
             </p>
-            {products.length === 0 && (
+            {summary.total === 0 && (
               <Link
                 to="/upload"
                 className="inline-flex items-center px-4 py-2 border border-transparent text-sm font-medium rounded-md shadow-sm text-white bg-blue-600 hover:bg-blue-700"
@@ -173,7 +196,7 @@ const Dashboard = () => {
                 </tr>
               </thead>
               <tbody className="bg-white divide-y divide-gray-200">
-                {filteredProducts.map((product) => (
+                {products.map((product) => (
                   <tr key={product.product_id} className="hover:bg-gray-50">
                     <td className="px-6 py-4 whitespace-nowrap text-sm font-medium text-gray-900">
                       {product.product_id}
@@ -210,8 +233,17 @@ const Dashboard = () => {
         )}
       </div>
 
-      {/* Refresh Button */}
-      <div className="mt-6 text-center">
+      {/* Pagination and Refresh */}
+      <div className="mt-6 flex justify-center gap-4">
+        {nextCursor && (
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="inline-flex items-center px-4 py-2 border border-transparent rounded-md shadow-sm text-sm font-medium text-white bg-blue-600 hover:bg-blue-700 disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load More'}
+          </button>
+        )}
         <button
           onClick={fetchProducts}
           className="inline-flex items-center px-4 py-2 border border-gray-300 rounded-md shadow-sm text-sm font-medium text-gray-700 bg-white hover:bg-gray-50"
@@ -67,9 +67,20 @@ const Upload = () => {
     try {
       setProcessing(true);
       
-      const result = await api.post('/process', {});
+      const { job_id } = await api.post('/process', {});
+      const job = await api.waitForJob(job_id);
+
+      if (job.status !== 'succeeded') {
+        const failed = job.failed_items.length ? `${job.failed_items.length} products failed: ` : '';
+        throw new Error(failed + (job.errors.join('; ') || `job ${job.status}`));
+      }
       
-      toast.success(`Processing complete! Analyzed ${result.products_processed} products.`);
+      toast.success(`Processing complete! Analyzed ${job.result.products_processed} products.`);
+      if (job.result.products_failed) {
+        toast.error(
+          `${job.result.products_failed} products failed and will be retried on the next run: ${job.failed_items.join(', ')}`
+        );
+      }
       
       // Navigate to dashboard after successful processing
       setTimeout(() => {
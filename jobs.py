@@ -0,0 +1,202 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+import logging
+from collections import OrderedDict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Job states; the last three are terminal
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+class Job:
+    """Progress and outcome of one background job"""
+
+    MAX_ERRORS = 100
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.total = 0
+        self.done = 0
+        self.errors: List[str] = []
+        # Items (product ids) whose step raised; the job leaves their stored results alone
+        self.failed_items: Set[str] = set()
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started = None
+        self._elapsed = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def raise_if_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def advance(self, count: int = 1):
+        self.done += count
+
+    def add_error(self, message: str):
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(message)
+
+    def fail_items(self, item_ids: Iterable[str], message: str):
+        """Record an error for items that could not be processed"""
+        self.failed_items.update(item_ids)
+        self.add_error(message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly view for the /jobs endpoints"""
+        if self._elapsed is not None:
+            elapsed = self._elapsed
+        elif self._started is not None:
+            elapsed = time.perf_counter() - self._started
+        else:
+            elapsed = 0.0
+
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "products_done": self.done,
+            "products_total": self.total,
+            "elapsed_seconds": round(elapsed, 3),
+            "products_per_second": round(self.done / elapsed, 2) if elapsed > 0 else 0.0,
+            "cancel_requested": self.cancel_requested,
+            "errors": list(self.errors),
+            "failed_items": sorted(self.failed_items),
+            "result": self.result,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class JobManager:
+    """Runs jobs on a private event loop thread with a worker pool for blocking steps.
+
+    Jobs that write to the database hold mutation_lock for their whole
+    run, so at most one of them (or one upload) mutates the tables at a time.
+    CPU-bound steps can also be sharded across a process pool of
+    process_workers (default: one per core), started on first use.
+    """
+
+    def __init__(self, workers: int = 2, history: int = 100, process_workers: Optional[int] = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fitloop-job")
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.mutation_lock = threading.Lock()
+        self.history = history
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="fitloop-jobs", daemon=True)
+            self._thread.start()
+        return self._loop
+
+    def submit(self, kind: str, func: Callable[[Job], Awaitable[Dict[str, Any]]]) -> Job:
+        """Queue func(job) to run in the background and return its Job"""
+        job = Job(kind)
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+            self._trim_history()
+        asyncio.run_coroutine_threadsafe(self._run(job, func), self._ensure_loop())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job that is still in the history"""
+        return self.jobs.get(job_id)
+
+    def recent(self) -> List[Job]:
+        """Jobs newest first"""
+        with self._jobs_lock:
+            return list(reversed(self.jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cooperative cancellation; the job stops at its next checkpoint"""
+        job = self.jobs.get(job_id)
+        if job and job.status not in FINISHED_STATES:
+            job._cancel.set()
+        return job
+
+    async def run_blocking(self, func: Callable[..., Any], *args) -> Any:
+        """Run a blocking call on the worker pool from inside a job"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def run_in_process(self, func: Callable[..., Any], *args) -> Any:
+        """Run a picklable top-level function on the process pool from inside a job"""
+        if self._process_pool is None:
+            # spawn, not fork: the server process has threads and open database handles
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._process_pool, func, *args)
+
+    async def _run(self, job: Job, func: Callable[[Job], Awaitable[Dict[str, Any]]]):
+        # Wait for the table lock without blocking other jobs' event loop work
+        while not self.mutation_lock.acquire(blocking=False):
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+                return
+            await asyncio.sleep(0.1)
+
+        try:
+            job.status = RUNNING
+            job.started_at = datetime.utcnow()
+            job._started = time.perf_counter()
+            job.raise_if_cancelled()
+            job.result = await func(job)
+            if job.total and len(job.failed_items) >= job.total:
+                # Every item raised: nothing was produced, so the job did not succeed
+                logger.error(f"Job {job.id} failed: all {job.total} products failed")
+                self._finish(job, FAILED)
+            else:
+                self._finish(job, SUCCEEDED)
+        except JobCancelled:
+            logger.info(f"Job {job.id} cancelled after {job.done}/{job.total} products")
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job.add_error(str(e))
+            self._finish(job, FAILED)
+        finally:
+            self.mutation_lock.release()
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        if job._started is not None:
+            job._elapsed = time.perf_counter() - job._started
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        """Stop the event loop thread and worker pools"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
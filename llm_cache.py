@@ -0,0 +1,119 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# accessed_at is only rewritten when older than this, so cache hits rarely write
+ACCESS_REFRESH_SECONDS = 3600
+
+class LLMCache:
+    """On-disk cache of LLM completions keyed by model, temperature and prompt.
+
+    Entries expire after ttl_seconds and the least recently used ones are
+    evicted once more than max_entries are stored. Access times are kept
+    to within ACCESS_REFRESH_SECONDS, and the entry count is tracked in
+    memory, counted once at open (other processes' inserts are picked up
+    on the next open).
+    """
+
+    def __init__(self, path: str = "./llm_cache.db", max_entries: int = 10000, ttl_seconds: int = 30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_completions_accessed_at ON completions (accessed_at)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMCache"]:
+        """Build a cache from LLM_CACHE_* settings, or None when disabled"""
+        path = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+        if not path:
+            return None
+        return cls(
+            path=path,
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+        )
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> str:
+        """Content address for a completion request"""
+        digest = hashlib.sha256()
+        digest.update(f"{model}\x00{temperature!r}\x00".encode("utf-8"))
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, model: str, temperature: float, prompt: str) -> Optional[str]:
+        """Return a cached completion, refreshing its LRU position"""
+        key = self.make_key(model, temperature, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at, accessed_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            content, created_at, accessed_at = row
+            if now - created_at > self.ttl_seconds:
+                self._count -= self._conn.execute("DELETE FROM completions WHERE key = ?", (key,)).rowcount
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            if now - accessed_at > ACCESS_REFRESH_SECONDS:
+                self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            self.hits += 1
+            return content
+
+    def put(self, model: str, temperature: float, prompt: str, content: str):
+        """Store a completion and evict the least recently used overflow"""
+        key = self.make_key(model, temperature, prompt)
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE completions SET content = ?, created_at = ?, accessed_at = ? WHERE key = ?",
+                (content, now, now, key)
+            ).rowcount
+            if not updated:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO completions (key, content, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, content, now, now)
+                )
+                self._count += 1
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                self._count -= self._conn.execute(
+                    "DELETE FROM completions WHERE key IN "
+                    "(SELECT key FROM completions ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,)
+                ).rowcount
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every cached completion"""
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+            self._count = 0
@@ -1,48 +1,56 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Header
-from fastapi.responses import Response, HTMLResponse
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Header, Query, Request
+from fastapi.responses import Response, HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-import io
+from sqlalchemy import insert, or_, func, case
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Tuple
 import os
-import csv
+import json
+import time
+import base64
+import asyncio
+import hashlib
 import logging
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
 from collections import defaultdict, Counter
 
-from database import get_db, Review, Return, Issue, Product, GeneratedCopy
-from ai_processor import AIProcessor
-
-# CSV utility functions (inline to avoid import issues)
-def read_csv_from_string(csv_content: str) -> List[Dict]:
-    """Read CSV content from string and return list of dictionaries"""
-    try:
-        reader = csv.DictReader(io.StringIO(csv_content))
-        return list(reader)
-    except Exception as e:
-        print(f"Error reading CSV: {e}")
-        return []
-
-def safe_float(value: str, default: float = 0.0) -> float:
-    """Safely convert string to float"""
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return default
-
-def safe_int(value: str, default: int = 0) -> int:
-    """Safely convert string to int"""
-    try:
-        return int(value)
-    except (ValueError, TypeError):
-        return default
+from database import (
+    get_db, init_db, SessionLocal, dedup_insert, normalized_columns, raw_hash_columns, date_columns,
+    Review, Return, Issue, Product, GeneratedCopy, ProductFingerprint, DirtyProduct, DailyFeedback, DailyIssueHits,
+    DescriptorCluster
+)
+from ai_processor import AIProcessor, SIZE_KEYWORDS, CARE_KEYWORDS, estimate_tokens, extract_issues_rule_based_shard
+from csv_utils import open_upload_stream, iter_batches, safe_int
+from text_utils import feedback_count
+from jobs import Job, JobManager
+from scoring import score_table
+from descriptor_clusters import DescriptorIndex
+from read_cache import ReadCache
+from exports import EXPORT_FORMATS, render_markdown, stream_export
+from static_files import StaticIndex, serve_static, static_page
+from metrics import (
+    REGISTRY, ROWS_PROCESSED, CallbackCounter, MetricsMiddleware,
+    record_stage, timed, detach_request_timings
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="FitLoop API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Migrate the database before serving, stop the job workers on the way out"""
+    # Deploys that run `python database.py` as a release step can skip this
+    if os.getenv("DB_INIT_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        with timed("db_init"):
+            init_db()
+    yield
+    job_manager.shutdown()
+
+app = FastAPI(title="FitLoop API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -53,17 +61,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency by route, plus per-stage Server-Timing headers when SERVER_TIMING is set
+app.add_middleware(MetricsMiddleware, server_timing=os.getenv("SERVER_TIMING", "").lower() in ("1", "true", "yes"))
+
 # If frontend build exists, set up directory references
 FRONTEND_BUILD_DIR = os.path.join(os.path.dirname(__file__), 'frontend', 'dist')
 
+# The build is read into memory once and served with compression and caching headers
+frontend_files = StaticIndex(FRONTEND_BUILD_DIR, max_preload_bytes=int(os.getenv("STATIC_MAX_PRELOAD_MB", "10")) * 1024 * 1024)
+
 # Note: We handle React app serving through custom route handlers below
 # instead of mounting to avoid routing conflicts
 
-# Serve simple HTML frontend if React build doesn't exist
-@app.get("/simple")
-async def simple_frontend():
-    """Serve simple HTML frontend"""
-    html_content = '''<!DOCTYPE html>
+# Simple HTML frontend, served when the React build doesn't exist
+SIMPLE_FRONTEND_HTML = '''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -231,14 +242,27 @@ async def simple_frontend():
                 
                 if (!processResponse.ok) throw new Error('Processing failed');
                 
+                // Wait for the background job to finish
+                const { job_id } = await processResponse.json();
+                let job;
+                do {
+                    await new Promise(resolve => setTimeout(resolve, 1000));
+                    const jobResponse = await fetch(`${API_BASE}/jobs/${job_id}`, {
+                        headers: { 'X-Auth-Token': AUTH_TOKEN }
+                    });
+                    job = await jobResponse.json();
+                } while (job.status === 'queued' || job.status === 'running');
+                
+                if (job.status !== 'succeeded') throw new Error('Processing ' + job.status);
+                
                 // Get products
                 const productsResponse = await fetch(`${API_BASE}/products`, {
                     headers: { 'X-Auth-Token': AUTH_TOKEN }
                 });
                 
                 if (productsResponse.ok) {
-                    const products = await productsResponse.json();
-                    displayResults(products);
+                    const page = await productsResponse.json();
+                    displayResults(page.items);
                 } else {
                     throw new Error('Failed to fetch results');
                 }
@@ -253,11 +277,52 @@ async def simple_frontend():
     </script>
 </body>
 </html>'''
-    return HTMLResponse(content=html_content)
+
+# Encoded and compressed once at import, not on every request
+simple_page = static_page(SIMPLE_FRONTEND_HTML)
+
+@app.get("/simple", response_class=HTMLResponse)
+def simple_frontend(request: Request):
+    """Serve simple HTML frontend"""
+    return serve_static(simple_page, request.headers)
 
 # Initialize AI processor
 ai_processor = AIProcessor()
 
+# Near-duplicate LLM descriptors are merged into canonical ones; rule descriptors seed the clusters
+descriptor_index = DescriptorIndex(
+    seeds=[*SIZE_KEYWORDS, *CARE_KEYWORDS],
+    keywords={
+        **{("fit", name): phrases for name, phrases in SIZE_KEYWORDS.items()},
+        **{("care", name): phrases for name, phrases in CARE_KEYWORDS.items()}
+    },
+    threshold=float(os.getenv("DESCRIPTOR_SIMILARITY", "0.7"))
+)
+
+# Background worker for /process jobs
+job_manager = JobManager(
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    process_workers=int(os.getenv("RULE_WORKERS", "0")) or None
+)
+
+# Rule-based extraction is sharded across processes for catalogs at least this big
+RULE_PARALLEL_MIN_PRODUCTS = int(os.getenv("RULE_PARALLEL_MIN_PRODUCTS", "500"))
+RULE_SHARD_SIZE = int(os.getenv("RULE_SHARD_SIZE", "250"))
+
+# Rendered read responses, valid until the next upload or /process commit
+read_cache = ReadCache.from_env()
+
+def cache_request_counts() -> Dict[Tuple[str, ...], float]:
+    """Hit and miss tallies of the LLM response cache and the read cache"""
+    counts = {("read", "hit"): read_cache.hits, ("read", "miss"): read_cache.misses}
+    if ai_processor.cache:
+        counts.update({("llm", "hit"): ai_processor.cache.hits, ("llm", "miss"): ai_processor.cache.misses})
+    return counts
+
+REGISTRY.register(CallbackCounter(
+    "fitloop_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"], cache_request_counts
+))
+
 # Authentication
 def verify_token(x_auth_token: Optional[str] = Header(None)):
     expected_token = os.getenv("AUTH_TOKEN", "fitloop2024")
@@ -265,295 +330,1020 @@ def verify_token(x_auth_token: Optional[str] = Header(None)):
         raise HTTPException(status_code=401, detail="Invalid authentication token")
     return True
 
+REQUIRED_REVIEW_COLS = ['product_id', 'review_text', 'rating', 'date']
+REQUIRED_RETURN_COLS = ['product_id', 'return_reason_text', 'condition_flag', 'date']
+
+# Rows per executemany batch during upload
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", "5000"))
+
+def review_mapping(row: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a reviews CSV row into Review column values"""
+    return {
+        "product_id": str(row['product_id']),
+        "review_text": str(row['review_text']),
+        "rating": safe_int(row.get('rating', '3'), 3),
+        "date": str(row['date']),
+        **normalized_columns(str(row['review_text'])),
+        **raw_hash_columns(str(row['review_text'])),
+        **date_columns(row['date'])
+    }
+
+def return_mapping(row: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a returns CSV row into Return column values"""
+    return {
+        "product_id": str(row['product_id']),
+        "return_reason_text": str(row['return_reason_text']),
+        "condition_flag": str(row['condition_flag']),
+        "date": str(row['date']),
+        **normalized_columns(str(row['return_reason_text'])),
+        **raw_hash_columns(str(row['return_reason_text'])),
+        **date_columns(row['date'])
+    }
+
+# Upload modes: wipe and reload, add new rows only, or add and overwrite
+UPLOAD_MODES = ("replace", "append", "upsert")
+
+# Non-key columns refreshed by upsert uploads
+UPSERT_COLUMNS = {Review: ("rating",), Return: ("condition_flag",)}
+
+def mark_products_dirty(db: Session, product_ids):
+    """Flag products for the next incremental /process run"""
+    stmt = dedup_insert(DirtyProduct)
+    db.execute(stmt, [{"product_id": pid, "marked_at": datetime.utcnow()} for pid in product_ids])
+
+def number_repeats(mappings: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Set each row's occurrence: how many earlier rows of the upload share its product, raw text and date"""
+    seen: Dict[int, int] = {}
+    for mapping in mappings:
+        # One int per distinct row rather than its strings
+        key = hash((mapping["product_id"], mapping["raw_hash"], mapping["date"]))
+        mapping["occurrence"] = seen.get(key, 0)
+        seen[key] = mapping["occurrence"] + 1
+        yield mapping
+
+def bulk_insert_rows(db: Session, model, rows, to_mapping, mode: str = "replace") -> Tuple[int, int]:
+    """Insert rows in executemany batches without building ORM objects.
+
+    Every row is kept in replace mode, repeats included. In append and
+    upsert mode a row whose natural key is already stored (the nth copy
+    of a text matching the nth stored copy) is skipped, or updated in
+    upsert mode. Returns (rows read, rows written).
+    """
+    if mode == "replace":
+        stmt = insert(model.__table__)
+    else:
+        stmt = dedup_insert(model, UPSERT_COLUMNS[model] if mode == "upsert" else ())
+    total = written = 0
+    parse_seconds = insert_seconds = 0.0
+    batches = iter_batches(number_repeats(to_mapping(row) for row in rows), UPLOAD_BATCH_SIZE)
+    while True:
+        # Reading the next batch is where the CSV is actually parsed
+        started = time.perf_counter()
+        batch = next(batches, None)
+        parse_seconds += time.perf_counter() - started
+        if batch is None:
+            break
+        started = time.perf_counter()
+        result = db.execute(stmt, batch)
+        total += len(batch)
+        written += max(result.rowcount, 0)
+        if mode != "replace" and result.rowcount:
+            mark_products_dirty(db, {row["product_id"] for row in batch})
+        insert_seconds += time.perf_counter() - started
+    record_stage("csv_parse", parse_seconds)
+    record_stage("db_insert", insert_seconds)
+    ROWS_PROCESSED.inc(total, kind=model.__tablename__)
+    return total, written
+
 @app.post("/upload")
-async def upload_files(
+def upload_files(
     reviews_csv: UploadFile = File(...),
     returns_csv: UploadFile = File(...),
+    mode: str = "replace",
     db: Session = Depends(get_db),
     _: bool = Depends(verify_token)
 ):
-    """Upload and validate CSV files"""
+    """Upload and validate feedback files.
+
+    Each file may be CSV (plain, gzip or zstd), Parquet or Arrow IPC,
+    detected from its content. Both are streamed from their spooled
+    uploads and inserted in batches, so memory use does not grow with
+    file size. mode=replace
+    wipes all data first; append and upsert merge into existing rows and
+    mark touched products dirty for the next /process.
+    """
+    locked = False
     try:
-        # Read and validate reviews CSV
-        reviews_content = await reviews_csv.read()
-        reviews_data = read_csv_from_string(reviews_content.decode('utf-8'))
-        
-        required_review_cols = ['product_id', 'review_text', 'rating', 'date']
-        if not reviews_data or not all(col in reviews_data[0].keys() for col in required_review_cols):
-            if not reviews_data:
-                raise HTTPException(status_code=400, detail="Reviews CSV is empty")
-            missing_cols = [col for col in required_review_cols if col not in reviews_data[0].keys()]
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Reviews CSV missing required columns: {missing_cols}"
-            )
-        
-        # Read and validate returns CSV
-        returns_content = await returns_csv.read()
-        returns_data = read_csv_from_string(returns_content.decode('utf-8'))
-        
-        required_return_cols = ['product_id', 'return_reason_text', 'condition_flag', 'date']
-        if not returns_data or not all(col in returns_data[0].keys() for col in required_return_cols):
-            if not returns_data:
-                raise HTTPException(status_code=400, detail="Returns CSV is empty")
-            missing_cols = [col for col in required_return_cols if col not in returns_data[0].keys()]
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Returns CSV missing required columns: {missing_cols}"
-            )
-        
-        # Clear existing data
-        db.query(Review).delete()
-        db.query(Return).delete()
-        db.query(Issue).delete()
-        db.query(Product).delete()
-        db.query(GeneratedCopy).delete()
+        started = time.perf_counter()
+
+        if mode not in UPLOAD_MODES:
+            raise HTTPException(status_code=400, detail=f"Invalid upload mode '{mode}', expected one of {list(UPLOAD_MODES)}")
+
+        if not job_manager.mutation_lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="A processing job is running; retry the upload once it finishes")
+        locked = True
+
+        # Validate both headers before touching existing data
+        try:
+            reviews_reader = open_upload_stream(reviews_csv.file, REQUIRED_REVIEW_COLS, "Reviews CSV")
+            returns_reader = open_upload_stream(returns_csv.file, REQUIRED_RETURN_COLS, "Returns CSV")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Insert reviews
-        for row in reviews_data:
-            review = Review(
-                product_id=str(row['product_id']),
-                review_text=str(row['review_text']),
-                rating=safe_int(row.get('rating', '3'), 3),
-                date=str(row['date'])
-            )
-            db.add(review)
+        if mode == "replace":
+            # Clear existing data
+            db.query(Review).delete()
+            db.query(Return).delete()
+            db.query(Issue).delete()
+            db.query(Product).delete()
+            db.query(GeneratedCopy).delete()
+            db.query(ProductFingerprint).delete()
+            db.query(DirtyProduct).delete()
+            db.query(DailyFeedback).delete()
+            db.query(DailyIssueHits).delete()
         
-        # Insert returns
-        for row in returns_data:
-            return_record = Return(
-                product_id=str(row['product_id']),
-                return_reason_text=str(row['return_reason_text']),
-                condition_flag=str(row['condition_flag']),
-                date=str(row['date'])
-            )
-            db.add(return_record)
+        reviews_uploaded, reviews_written = bulk_insert_rows(db, Review, reviews_reader, review_mapping, mode)
+        if not reviews_uploaded and mode == "replace":
+            raise HTTPException(status_code=400, detail="Reviews CSV is empty")
+
+        returns_uploaded, returns_written = bulk_insert_rows(db, Return, returns_reader, return_mapping, mode)
+        if not returns_uploaded and mode == "replace":
+            raise HTTPException(status_code=400, detail="Returns CSV is empty")
         
-        db.commit()
+        with timed("upload_commit"):
+            db.commit()
+        if mode == "replace":
+            read_cache.clear()
+
+        elapsed = time.perf_counter() - started
+        total_rows = reviews_uploaded + returns_uploaded
+        rows_per_second = total_rows / elapsed if elapsed > 0 else float(total_rows)
         
-        logger.info(f"Uploaded {len(reviews_data)} reviews and {len(returns_data)} returns")
+        logger.info(
+            f"Uploaded {reviews_uploaded} reviews and {returns_uploaded} returns "
+            f"in {elapsed:.2f}s ({rows_per_second:.0f} rows/s)"
+        )
         
         return {
             "status": "success",
-            "reviews_uploaded": len(reviews_data),
-            "returns_uploaded": len(returns_data)
+            "mode": mode,
+            "reviews_uploaded": reviews_uploaded,
+            "returns_uploaded": returns_uploaded,
+            "reviews_written": reviews_written,
+            "returns_written": returns_written,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_per_second, 1)
         }
         
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Upload failed: {e}")
         raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
+    finally:
+        if locked:
+            job_manager.mutation_lock.release()
 
-@app.post("/process")
-async def process_data(
-    db: Session = Depends(get_db),
-    _: bool = Depends(verify_token)
-):
-    """Process uploaded data and extract issues"""
-    try:
-        # Get all reviews and returns
-        reviews = db.query(Review).all()
-        returns = db.query(Return).all()
+# SQLite caps bound parameters per statement, so IN () lists are chunked
+DELETE_CHUNK_SIZE = 500
+
+def content_fingerprint(feedback: List[Tuple[str, int]], extractor: str) -> str:
+    """Hash a product's (text, count) pairs independent of their order"""
+    digest = hashlib.sha256(extractor.encode("utf-8"))
+    for text, count in sorted(feedback):
+        digest.update(f"\x00{count}\x00".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+def chunked(items: List[str], size: int = DELETE_CHUNK_SIZE):
+    """Split a list into IN ()-sized chunks"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def clear_product_results(db: Session, product_ids: List[str]):
+    """Delete derived rows for the given products ahead of reprocessing"""
+    for chunk in chunked(product_ids):
+        for model in (Issue, Product, GeneratedCopy, ProductFingerprint, DailyFeedback, DailyIssueHits):
+            db.query(model).filter(model.product_id.in_(chunk)).delete(synchronize_session=False)
+
+def load_feedback(db: Session, product_ids: Optional[List[str]] = None) -> Dict[str, List[Tuple[str, int]]]:
+    """Normalized (text, count) pairs per product across reviews and returns, optionally for a subset.
+
+    Duplicates are collapsed in SQL by grouping on the text hash stored at
+    upload, so each distinct text is read and analyzed once.
+    """
+    counts = defaultdict(dict)
+    for model in (Review, Return):
+        query = db.query(
+            model.product_id, model.text_hash, func.min(model.normalized_text), func.count()
+        ).group_by(model.product_id, model.text_hash)
+        if product_ids is None:
+            queries = [query]
+        else:
+            queries = [query.filter(model.product_id.in_(chunk)) for chunk in chunked(product_ids)]
+        for query in queries:
+            for product_id, _, text, count in query:
+                product_counts = counts[product_id]
+                product_counts[text or ""] = product_counts.get(text or "", 0) + count
+
+    return {
+        product_id: sorted(product_counts.items(), key=lambda pair: -pair[1])
+        for product_id, product_counts in counts.items()
+    }
+
+def plan_processing(db: Session, incremental: bool = True) -> Dict[str, Any]:
+    """Work out which products need processing and load their feedback.
+
+    Read-only: nothing is written until store_results runs, so no write
+    lock is held while extraction is in flight.
+    """
+    known_products = {pid for (pid,) in db.query(Review.product_id).distinct()}
+    known_products.update(pid for (pid,) in db.query(Return.product_id).distinct())
+    
+    if not known_products:
+        raise ValueError("No data to process")
+
+    # Work out which products may have changed since their last run
+    extractor = ai_processor.extractor
+    dirty = [pid for (pid,) in db.query(DirtyProduct.product_id)]
+    if incremental:
+        previous = dict(db.query(ProductFingerprint.product_id, ProductFingerprint.content_hash).all())
+        # Products last analyzed by another extractor (rules vs LLM, or an older version) are redone too
+        stale = {
+            pid for (pid,) in db.query(ProductFingerprint.product_id).filter(
+                or_(ProductFingerprint.extractor.is_(None), ProductFingerprint.extractor != extractor)
+            )
+        }
+        dirty_set = set(dirty)
+        candidates = sorted(pid for pid in known_products if pid in dirty_set or pid in stale or pid not in previous)
+        product_data = load_feedback(db, candidates)
+    else:
+        previous = {}
+        product_data = load_feedback(db)
+
+    changed = {}
+    for product_id, feedback in product_data.items():
+        content_hash = content_fingerprint(feedback, extractor)
+        if previous.get(product_id) != content_hash:
+            changed[product_id] = {"texts": feedback, "content_hash": content_hash}
+
+    return {
+        "incremental": incremental,
+        "extractor": extractor,
+        "known_products": len(known_products),
+        "dirty": dirty,
+        "changed": changed
+    }
+
+def aggregate_issues(product_id: str, extracted_issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge extracted issues sharing a descriptor, category and body area"""
+    issue_aggregates = defaultdict(list)
+    for issue in extracted_issues:
+        key = (issue.get("descriptor", ""), issue.get("issue_category", ""), issue.get("body_area", ""))
+        issue_aggregates[key].append(issue)
+    
+    # Calculate aggregated metrics
+    final_issues = []
+    for (descriptor, category, body_area), issue_list in issue_aggregates.items():
+        if not descriptor:
+            continue
+            
+        avg_severity = sum(i.get("severity", 3) for i in issue_list) / len(issue_list)
+        total_frequency = sum(i.get("frequency_hint", 0) for i in issue_list) / len(issue_list)
         
-        if not reviews and not returns:
-            raise HTTPException(status_code=400, detail="No data to process")
+        final_issues.append({
+            "product_id": product_id,
+            "issue_category": category,
+            "body_area": body_area,
+            "descriptor": descriptor,
+            "severity": avg_severity,
+            "frequency_pct": min(100, total_frequency)
+        })
+    return merge_descriptor_clusters(final_issues)
+
+def merge_descriptor_clusters(issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fold issues whose descriptors share a cluster into one per category.
+
+    Members are usually the same complaints worded differently, so their
+    frequencies overlap and are not added: the cluster takes the most
+    frequent member's frequency, severity and body area.
+    """
+    clusters = defaultdict(list)
+    for issue in issues:
+        category = issue["issue_category"]
+        clusters[(descriptor_index.canonical(issue["descriptor"], category), category)].append(issue)
+    
+    merged = []
+    for (descriptor, category), members in clusters.items():
+        top = max(members, key=lambda issue: (issue["frequency_pct"], issue["severity"]))
+        merged.append({**top, "descriptor": descriptor})
+    return merged
+
+def apply_risk_scores(results: Dict[str, Optional[Dict[str, Any]]]):
+    """Fill in risk_score and top_issue_descriptor for every analyzed product.
+
+    All products' issues are scored together as one columnar table.
+    """
+    analyzed = [result for result in results.values() if result]
+    groups, severities, frequencies, descriptors = [], [], [], []
+    for index, result in enumerate(analyzed):
+        for issue in result["issues"]:
+            groups.append(index)
+            severities.append(issue["severity"])
+            frequencies.append(issue["frequency_pct"])
+            descriptors.append(issue["descriptor"])
+    
+    table = score_table(groups, severities, frequencies)
+    for index, risk_score, top_index in zip(table["products"], table["risk_score"], table["top_index"]):
+        analyzed[index]["risk_score"] = float(risk_score)
+        analyzed[index]["top_issue_descriptor"] = descriptors[top_index]
+
+def summarize_product(product_id: str, extracted_issues: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Aggregate extracted issues, or None if nothing usable"""
+    if not extracted_issues:
+        logger.info(f"No issues extracted for {product_id}")
+        return None
+    
+    final_issues = aggregate_issues(product_id, extracted_issues)
+    if not final_issues:
+        return None
+    
+    return {"issues": final_issues}
+
+def has_enough_feedback(product_id: str, texts: List[Tuple[str, int]]) -> bool:
+    """Products with fewer than three texts (duplicates included) are not analyzed"""
+    total = feedback_count(texts)
+    if total < 3:
+        logger.info(f"Skipping {product_id}: insufficient data ({total} texts)")
+        return False
+    return True
+
+def analyze_product(product_id: str, texts: List[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+    """Extract, score and write copy for one product (blocking)"""
+    if not has_enough_feedback(product_id, texts):
+        return None
+    
+    with timed("extraction"):
+        extracted_issues = ai_processor.extract_issues_llm(product_id, texts)
+    return finish_product(product_id, extracted_issues)
+
+def finish_product(product_id: str, extracted_issues: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Aggregate extracted issues and write copy for them (blocking)"""
+    with timed("aggregation"):
+        result = summarize_product(product_id, extracted_issues)
+    if result:
+        with timed("copy_generation"):
+            result["copy"] = ai_processor.generate_copy(product_id, result["issues"])
+    return result
+
+async def analyze_products_parallel(changed: Dict[str, Dict[str, Any]], job: Job) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Rule-based analysis with extraction sharded across the process pool.
+
+    Only (product_id, (text, count) pairs) go to the workers and only their issue
+    lists come back; aggregation and copy stay in this process. At most
+    two shards per worker are in flight so cancellation takes effect
+    without waiting for the whole catalog.
+    """
+    results = {pid: None for pid in changed}
+    eligible = [(pid, item["texts"]) for pid, item in changed.items() if has_enough_feedback(pid, item["texts"])]
+    job.advance(len(changed) - len(eligible))
+    slots = asyncio.Semaphore(2 * job_manager.process_workers)
+    
+    async def run_shard(shard: List[Tuple[str, List[Tuple[str, int]]]]):
+        async with slots:
+            if job.cancel_requested:
+                return
+            try:
+                with timed("extraction"):
+                    extracted = await job_manager.run_in_process(extract_issues_rule_based_shard, shard)
+                for product_id, issues in extracted:
+                    results[product_id] = finish_product(product_id, issues)
+            except Exception as e:
+                job.fail_items((pid for pid, _ in shard if results[pid] is None), f"shard of {len(shard)} ({shard[0][0]}...): {e}")
+            finally:
+                job.advance(len(shard))
+    
+    await asyncio.gather(*(run_shard(shard) for shard in iter_batches(eligible, RULE_SHARD_SIZE)))
+    job.raise_if_cancelled()
+    return results
+
+async def analyze_product_async(product_id: str, texts: List[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+    """Extract, score and write copy for one product on the async LLM client"""
+    if not has_enough_feedback(product_id, texts):
+        return None
+    
+    with timed("extraction"):
+        extracted_issues = await ai_processor.extract_issues_llm_async(product_id, texts)
+    with timed("aggregation"):
+        result = summarize_product(product_id, extracted_issues)
+    if result:
+        with timed("copy_generation"):
+            result["copy"] = await ai_processor.generate_copy_async(product_id, result["issues"])
+    return result
+
+def batch_prompt_size(texts: List[Tuple[str, int]]) -> int:
+    """Estimated prompt tokens a product adds to a batched request (at most one chunk)"""
+    chunks = ai_processor.chunk_texts(texts)
+    return sum(estimate_tokens(text) + 2 for text, _ in chunks[0]) + 10 if chunks else 10
+
+async def analyze_batch_async(products: Dict[str, List[Tuple[str, int]]]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Extract, score and write copy for several products with batched LLM calls"""
+    eligible = {pid: texts for pid, texts in products.items() if has_enough_feedback(pid, texts)}
+    results = {pid: None for pid in products}
+    if not eligible:
+        return results
+    
+    with timed("extraction"):
+        extracted = await ai_processor.extract_issues_batch_async(eligible)
+    with timed("aggregation"):
+        for product_id in eligible:
+            results[product_id] = summarize_product(product_id, extracted.get(product_id, []))
+    
+    scored = {pid: result["issues"] for pid, result in results.items() if result}
+    if scored:
+        with timed("copy_generation"):
+            copies = await ai_processor.generate_copy_batch_async(scored)
+        for product_id in scored:
+            results[product_id]["copy"] = copies[product_id]
+    return results
+
+async def analyze_products(changed: Dict[str, Dict[str, Any]], job: Job) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Analyze every changed product, reporting progress on the job.
+
+    With an LLM client, products (or, with LLM_BATCH_PRODUCTS > 1,
+    token-budgeted batches of products) run concurrently, bounded by
+    LLM_CONCURRENCY. The rule-based path runs on the job worker pool, or
+    is sharded across processes for large catalogs. Cancellation is
+    checked before each product (or shard) starts.
+    """
+    if ai_processor.async_client:
+        slots = asyncio.Semaphore(ai_processor.concurrency)
         
-        # Group by product
-        product_data = defaultdict(lambda: {"reviews": [], "returns": []})
+        async def run_one(product_id: str) -> Optional[Dict[str, Any]]:
+            async with slots:
+                if job.cancel_requested:
+                    return None
+                try:
+                    return await analyze_product_async(product_id, changed[product_id]["texts"])
+                except Exception as e:
+                    job.fail_items([product_id], f"{product_id}: {e}")
+                    return None
+                finally:
+                    job.advance()
         
-        for review in reviews:
-            product_data[review.product_id]["reviews"].append(review.review_text)
+        async def run_batch(product_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+            async with slots:
+                if job.cancel_requested:
+                    return {}
+                try:
+                    return await analyze_batch_async({pid: changed[pid]["texts"] for pid in product_ids})
+                except Exception as e:
+                    job.fail_items(product_ids, f"batch of {len(product_ids)} ({product_ids[0]}...): {e}")
+                    return {}
+                finally:
+                    job.advance(len(product_ids))
         
-        for return_record in returns:
-            product_data[return_record.product_id]["returns"].append(return_record.return_reason_text)
+        if ai_processor.batch_products > 1:
+            sizes = {pid: batch_prompt_size(item["texts"]) for pid, item in changed.items()}
+            results = {}
+            for batch_results in await asyncio.gather(*(run_batch(batch) for batch in ai_processor.pack_batches(sizes))):
+                results.update(batch_results)
+            job.raise_if_cancelled()
+            return results
         
-        # Process each product
-        products_processed = 0
-        for product_id, data in product_data.items():
-            # Combine all feedback texts
-            all_texts = data["reviews"] + data["returns"]
-            
-            # Skip products with insufficient data
-            if len(all_texts) < 3:
-                logger.info(f"Skipping {product_id}: insufficient data ({len(all_texts)} texts)")
-                continue
-            
-            # Extract issues using AI
-            extracted_issues = ai_processor.extract_issues_llm(product_id, all_texts)
-            
-            if not extracted_issues:
-                logger.info(f"No issues extracted for {product_id}")
-                continue
-            
-            # Aggregate issues by descriptor
-            issue_aggregates = defaultdict(list)
-            for issue in extracted_issues:
-                key = (issue.get("descriptor", ""), issue.get("issue_category", ""), issue.get("body_area", ""))
-                issue_aggregates[key].append(issue)
-            
-            # Calculate aggregated metrics
-            final_issues = []
-            for (descriptor, category, body_area), issue_list in issue_aggregates.items():
-                if not descriptor:
-                    continue
-                    
-                avg_severity = sum(i.get("severity", 3) for i in issue_list) / len(issue_list)
-                total_frequency = sum(i.get("frequency_hint", 0) for i in issue_list) / len(issue_list)
-                
-                final_issues.append({
-                    "product_id": product_id,
-                    "issue_category": category,
-                    "body_area": body_area,
-                    "descriptor": descriptor,
-                    "severity": avg_severity,
-                    "frequency_pct": min(100, total_frequency)
-                })
-            
-            # Store issues in database
-            for issue_data in final_issues:
-                issue = Issue(
-                    product_id=issue_data["product_id"],
-                    issue_category=issue_data["issue_category"],
-                    body_area=issue_data["body_area"],
-                    descriptor=issue_data["descriptor"],
-                    severity=issue_data["severity"],
-                    frequency_pct=issue_data["frequency_pct"]
-                )
-                db.add(issue)
-            
-            # Calculate risk score
-            if final_issues:
-                # Normalize within product
-                severities = [i["severity"] for i in final_issues]
-                frequencies = [i["frequency_pct"] for i in final_issues]
-                
-                if len(severities) > 1:
-                    severity_range = max(severities) - min(severities)
-                    freq_range = max(frequencies) - min(frequencies)
-                    
-                    if severity_range > 0:
-                        severity_norm = [(s - min(severities)) / severity_range for s in severities]
-                    else:
-                        severity_norm = [0.5 for _ in severities]  # All same, use middle value
-                        
-                    if freq_range > 0:
-                        freq_norm = [(f - min(frequencies)) / freq_range for f in frequencies]
-                    else:
-                        freq_norm = [0.5 for _ in frequencies]  # All same, use middle value
-                else:
-                    severity_norm = [severities[0] / 5.0]
-                    freq_norm = [frequencies[0] / 100.0]
-                
-                # Weighted risk score
-                risk_scores = [0.6 * s + 0.4 * f for s, f in zip(severity_norm, freq_norm)]
-                avg_risk_score = sum(risk_scores) / len(risk_scores)
-                
-                # Get top issue
-                top_issue_idx = max(range(len(final_issues)), 
-                                  key=lambda i: final_issues[i]["severity"] * final_issues[i]["frequency_pct"])
-                top_issue_descriptor = final_issues[top_issue_idx]["descriptor"]
-                
-                # Store product summary
-                product = Product(
-                    product_id=product_id,
-                    risk_score=avg_risk_score,
-                    top_issue_descriptor=top_issue_descriptor,
-                    updated_at=datetime.utcnow()
-                )
-                db.add(product)
-                
-                # Generate copy
-                copy_result = ai_processor.generate_copy(product_id, final_issues)
-                generated_copy = GeneratedCopy(
-                    product_id=product_id,
-                    size_guidance=copy_result.get("size_guidance", ""),
-                    care_tip=copy_result.get("care_tip", ""),
-                    generated_at=datetime.utcnow()
-                )
-                db.add(generated_copy)
-                
-                products_processed += 1
+        product_ids = list(changed)
+        results = await asyncio.gather(*(run_one(pid) for pid in product_ids))
+        job.raise_if_cancelled()
+        return dict(zip(product_ids, results))
+    
+    if not ai_processor.llm_enabled and job_manager.process_workers > 1 and len(changed) >= RULE_PARALLEL_MIN_PRODUCTS:
+        return await analyze_products_parallel(changed, job)
+    
+    def run_all() -> Dict[str, Optional[Dict[str, Any]]]:
+        results = {}
+        for product_id, item in changed.items():
+            job.raise_if_cancelled()
+            try:
+                results[product_id] = analyze_product(product_id, item["texts"])
+            except Exception as e:
+                job.fail_items([product_id], f"{product_id}: {e}")
+                results[product_id] = None
+            job.advance()
+        return results
+    
+    return await job_manager.run_blocking(run_all)
+
+def build_daily_rollups(db: Session, product_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Per-day feedback counts and descriptor hits for the given products (read-only).
+
+    Feedback is grouped by (product, day, text hash) in SQL and each
+    distinct text is matched by the rules once, whichever extractor ran,
+    so hits mean the same thing on every day. Undated feedback is skipped.
+    """
+    feedback = defaultdict(int)
+    hits = defaultdict(int)
+    descriptors_for: Dict[str, List[str]] = {}
+    for model in (Review, Return):
+        query = db.query(
+            model.product_id, model.feedback_date, func.min(model.normalized_text), func.count()
+        ).filter(model.feedback_date.isnot(None)).group_by(model.product_id, model.feedback_date, model.text_hash)
+        for chunk in chunked(product_ids):
+            for product_id, day, text, count in query.filter(model.product_id.in_(chunk)):
+                feedback[(product_id, day)] += count
+                descriptors = descriptors_for.get(text)
+                if descriptors is None:
+                    descriptors = descriptors_for[text] = ai_processor.rule_descriptors(text or "")
+                for descriptor in descriptors:
+                    hits[(product_id, day, descriptor)] += count
+
+    return {
+        "feedback": [{"product_id": pid, "day": day, "texts": texts} for (pid, day), texts in feedback.items()],
+        "hits": [
+            {"product_id": pid, "day": day, "descriptor": descriptor, "hits": count}
+            for (pid, day, descriptor), count in hits.items()
+        ]
+    }
+
+def load_descriptor_index(db: Session):
+    """Pick up descriptor clusters saved by earlier runs or other workers"""
+    # Keyword (NULL) and similarity (< 1) merges written by earlier versions are not trusted
+    descriptor_index.update(db.query(DescriptorCluster.descriptor, DescriptorCluster.canonical).filter(
+        DescriptorCluster.similarity >= 1.0
+    ))
+
+def store_results(
+    db: Session,
+    plan: Dict[str, Any],
+    results: Dict[str, Optional[Dict[str, Any]]],
+    rollups: Dict[str, List[Dict[str, Any]]]
+) -> int:
+    """Replace derived rows for processed products and commit; returns products stored.
+
+    Products whose analysis failed (plan["failed"]) keep their previous
+    rows and fingerprint and stay marked dirty, so the next run retries them.
+    """
+    changed = plan["changed"]
+    failed = plan["failed"]
+    if plan["incremental"]:
+        clear_product_results(db, list(changed))
+    else:
+        for model in (Issue, Product, GeneratedCopy, ProductFingerprint, DailyFeedback, DailyIssueHits):
+            query = db.query(model)
+            if failed:
+                query = query.filter(model.product_id.notin_(failed))
+            query.delete(synchronize_session=False)
+    retry = set(failed)
+    for chunk in chunked([pid for pid in plan["dirty"] if pid not in retry]):
+        db.query(DirtyProduct).filter(DirtyProduct.product_id.in_(chunk)).delete(synchronize_session=False)
+    
+    now = datetime.utcnow()
+    for batch in iter_batches(failed, UPLOAD_BATCH_SIZE):
+        db.execute(dedup_insert(DirtyProduct), [{"product_id": pid, "marked_at": now} for pid in batch])
+    fingerprints, issues, products, copies = [], [], [], []
+    for product_id, item in changed.items():
+        fingerprints.append({
+            "product_id": product_id, "content_hash": item["content_hash"],
+            "extractor": plan["extractor"], "processed_at": now
+        })
+        
+        result = results.get(product_id)
+        if not result:
+            continue
         
-        db.commit()
+        product_issues = [
+            {
+                **{key: issue[key] for key in ("product_id", "issue_category", "body_area", "descriptor")},
+                # As the Float columns read back, so the rendered JSON matches the stored rows
+                "severity": float(issue["severity"]),
+                "frequency_pct": float(issue["frequency_pct"])
+            }
+            for issue in result["issues"]
+        ]
+        product = {
+            "product_id": product_id,
+            "risk_score": result["risk_score"],
+            "top_issue_descriptor": result["top_issue_descriptor"],
+            "updated_at": now
+        }
+        copy = {
+            "product_id": product_id,
+            "size_guidance": result["copy"].get("size_guidance", ""),
+            "care_tip": result["copy"].get("care_tip", ""),
+            "generated_at": now
+        }
+        issues.extend(product_issues)
+        products.append({**product, **render_product_payloads(product, product_issues, copy)})
+        copies.append(copy)
+    
+    for model, rows in (
+        (ProductFingerprint, fingerprints), (Issue, issues), (Product, products), (GeneratedCopy, copies),
+        (DailyFeedback, rollups["feedback"]), (DailyIssueHits, rollups["hits"])
+    ):
+        for batch in iter_batches(rows, UPLOAD_BATCH_SIZE):
+            db.execute(insert(model), batch)
+    
+    # New descriptor mappings outlive the products they came from; a full reprocess keeps them
+    clusters = descriptor_index.pending()
+    for batch in iter_batches(clusters, UPLOAD_BATCH_SIZE):
+        db.execute(dedup_insert(DescriptorCluster), [
+            {"descriptor": descriptor, "canonical": canonical, "similarity": 1.0, "created_at": now}
+            for descriptor, canonical in batch
+        ])
+    
+    db.commit()
+    descriptor_index.mark_saved(descriptor for descriptor, _ in clusters)
+    if not plan["incremental"]:
+        read_cache.clear()
+    elif changed:
+        read_cache.invalidate(changed)
+    return len(products)
+
+async def run_process_job(job: Job, incremental: bool) -> Dict[str, Any]:
+    """Background body of a /process job; writes happen only in the final step"""
+    # The job outlives the request that queued it; keep its stages out of that response's timings
+    detach_request_timings()
+    db = SessionLocal()
+    try:
+        with timed("grouping"):
+            plan = await job_manager.run_blocking(plan_processing, db, incremental)
+            await job_manager.run_blocking(load_descriptor_index, db)
+        products_skipped = plan["known_products"] - len(plan["changed"])
+        job.total = len(plan["changed"])
         
-        logger.info(f"Processed {products_processed} products")
+        with timed("analysis"):
+            results = await analyze_products(plan["changed"], job)
+        job.raise_if_cancelled()
+        # Products whose analysis raised are left as they were and retried next run
+        plan["failed"] = sorted(job.failed_items)
+        plan["changed"] = {pid: item for pid, item in plan["changed"].items() if pid not in job.failed_items}
+        with timed("risk_scoring"):
+            await job_manager.run_blocking(apply_risk_scores, results)
+        with timed("rollups"):
+            rollups = await job_manager.run_blocking(build_daily_rollups, db, list(plan["changed"]))
+        with timed("commit"):
+            products_processed = await job_manager.run_blocking(store_results, db, plan, results, rollups)
+        ROWS_PROCESSED.inc(len(plan["changed"]), kind="products")
+        
+        logger.info(
+            f"Processed {products_processed} products ({products_skipped} unchanged, skipped; "
+            f"{len(plan['failed'])} failed, kept for retry)"
+        )
         
         return {
-            "status": "processed",
-            "products_processed": products_processed
+            "products_processed": products_processed,
+            "products_skipped": products_skipped,
+            "products_failed": len(plan["failed"])
         }
-        
-    except Exception as e:
+    except Exception:
         db.rollback()
-        logger.error(f"Processing failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+@app.post("/process", status_code=202)
+def process_data(
+    incremental: bool = True,
+    db: Session = Depends(get_db),
+    _: bool = Depends(verify_token)
+):
+    """Queue a processing job and return its id; poll /jobs/{job_id} for progress.
+
+    In incremental mode (the default) only products marked dirty by an
+    upload, never processed before, or last analyzed by a different
+    extractor are loaded; of those, products whose feedback fingerprint
+    matches their last run are skipped.
+    """
+    if db.query(Review.id).first() is None and db.query(Return.id).first() is None:
+        raise HTTPException(status_code=400, detail="No data to process")
+    
+    job = job_manager.submit("process", lambda job: run_process_job(job, incremental))
+    logger.info(f"Queued process job {job.id} (incremental={incremental})")
+    
+    return {
+        "status": "queued",
+        "job_id": job.id
+    }
+
+@app.get("/jobs")
+def list_jobs(_: bool = Depends(verify_token)):
+    """List recent background jobs, newest first"""
+    return [job.to_dict() for job in job_manager.recent()]
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, _: bool = Depends(verify_token)):
+    """Get status, progress and throughput of a background job"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, _: bool = Depends(verify_token)):
+    """Ask a queued or running job to stop before it writes its results"""
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+# Page sizes for /products; the first page is an index range scan of this length
+PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", "100"))
+PRODUCTS_MAX_PAGE_SIZE = 1000
+
+# Fields /products can return; product_id and risk_score are always read for the cursor
+PRODUCT_FIELDS = {
+    "product_id": lambda row: row.product_id,
+    "risk_score": lambda row: round(row.risk_score, 3),
+    "top_issue_descriptor": lambda row: row.top_issue_descriptor,
+    "updated_at": lambda row: row.updated_at.isoformat() if row.updated_at else None
+}
+
+def encode_cursor(risk_score: float, product_id: str) -> str:
+    """Opaque cursor for the row after (risk_score, product_id) in listing order"""
+    raw = json.dumps([risk_score, product_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        risk_score, product_id = json.loads(raw)
+        return float(risk_score), str(product_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Validate a comma-separated field list, defaulting to every field"""
+    if not fields:
+        return list(PRODUCT_FIELDS)
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in PRODUCT_FIELDS]
+    if unknown or not selected:
+        raise ValueError(f"Unknown fields: {unknown}; choose from {list(PRODUCT_FIELDS)}")
+    return selected
+
+def filter_products(query, min_risk: Optional[float], max_risk: Optional[float], top_issue: Optional[str], search: Optional[str]):
+    """Apply the /products filters shared by the listing and its summary"""
+    if min_risk is not None:
+        query = query.filter(Product.risk_score >= min_risk)
+    if max_risk is not None:
+        query = query.filter(Product.risk_score <= max_risk)
+    if top_issue:
+        query = query.filter(Product.top_issue_descriptor.icontains(top_issue, autoescape=True))
+    if search:
+        query = query.filter(or_(
+            Product.product_id.icontains(search, autoescape=True),
+            Product.top_issue_descriptor.icontains(search, autoescape=True)
+        ))
+    return query
+
+def render_json(payload: Any) -> bytes:
+    """Serialize a read payload the way JSONResponse would"""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def cached_response(
+    request: Request,
+    key: Tuple,
+    build: Callable[[], bytes],
+    products: Optional[List[str]] = None,
+    media_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serve a read endpoint through read_cache, answering 304 when the ETag matches"""
+    entry = read_cache.get_or_build(key, build, products)
+    cache_headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=cache_headers)
+    return Response(content=entry.body, media_type=media_type, headers={**cache_headers, **(headers or {})})
 
 @app.get("/products")
-async def get_products(
+def get_products(
+    request: Request,
+    limit: int = Query(PRODUCTS_PAGE_SIZE, ge=1, le=PRODUCTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    top_issue: Optional[str] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     _: bool = Depends(verify_token)
 ):
-    """Get all products with summary data"""
+    """Get one page of products, highest risk first.
+
+    Pages are keyed on (risk_score, product_id) and read through the
+    matching composite index, so every page costs the same however deep
+    it is. Pass the returned next_cursor to fetch the following page;
+    it is null on the last one. top_issue and search are case-insensitive
+    substring filters, and fields selects a comma-separated subset of
+    product_id, risk_score, top_issue_descriptor and updated_at.
+    """
     try:
-        products = db.query(Product).order_by(Product.risk_score.desc()).all()
-        
-        result = []
-        for product in products:
-            result.append({
-                "product_id": product.product_id,
-                "risk_score": round(product.risk_score, 3),
-                "top_issue_descriptor": product.top_issue_descriptor,
-                "updated_at": product.updated_at.isoformat() if product.updated_at else None
-            })
-        
-        return result
+        selected = parse_fields(fields)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def build() -> bytes:
+        # With every field in the default order, items are the summary_json stored by /process
+        precomputed = selected == list(PRODUCT_FIELDS)
+        columns = [Product.risk_score, Product.product_id]
+        columns += [getattr(Product, name) for name in selected if name not in ("risk_score", "product_id")]
+        if precomputed:
+            columns.append(Product.summary_json)
+        query = filter_products(db.query(*columns), min_risk, max_risk, top_issue, search)
+
+        if after:
+            last_risk, last_product = after
+            # The leading range term lets the index seek straight to the cursor
+            query = query.filter(
+                Product.risk_score <= last_risk,
+                or_(Product.risk_score < last_risk, Product.product_id > last_product)
+            )
+
+        rows = query.order_by(Product.risk_score.desc(), Product.product_id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        page = {
+            "next_cursor": encode_cursor(rows[-1].risk_score, rows[-1].product_id) if has_more else None,
+            "limit": limit
+        }
+
+        if precomputed:
+            items = b",".join(
+                row.summary_json or render_json({name: PRODUCT_FIELDS[name](row) for name in selected})
+                for row in rows
+            )
+            return b'{"items":[' + items + b"]," + render_json(page)[1:]
+        return render_json({"items": [{name: PRODUCT_FIELDS[name](row) for name in selected} for row in rows], **page})
+
+    try:
+        key = ("products", limit, cursor, min_risk, max_risk, top_issue, search, tuple(selected))
+        return cached_response(request, key, build)
         
     except Exception as e:
         logger.error(f"Failed to get products: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/product/{product_id}")
-async def get_product_detail(
-    product_id: str,
+@app.get("/products/summary")
+def get_products_summary(
+    request: Request,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    top_issue: Optional[str] = None,
+    search: Optional[str] = None,
     db: Session = Depends(get_db),
     _: bool = Depends(verify_token)
 ):
-    """Get detailed information for a specific product"""
+    """Count products by risk band, with the same filters as /products"""
+    def build() -> bytes:
+        query = filter_products(
+            db.query(
+                func.count(Product.product_id),
+                func.count(case((Product.risk_score >= 0.7, 1))),
+                func.count(case((Product.risk_score >= 0.4, 1)))
+            ),
+            min_risk, max_risk, top_issue, search
+        )
+        total, high, medium_or_high = query.one()
+        return render_json({
+            "total": total,
+            "high_risk": high,
+            "medium_risk": medium_or_high - high,
+            "low_risk": total - medium_or_high
+        })
+
     try:
-        # Get product summary
-        product = db.query(Product).filter(Product.product_id == product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        
-        # Get issues
-        issues = db.query(Issue).filter(Issue.product_id == product_id).all()
-        
-        # Get generated copy
-        generated_copy = db.query(GeneratedCopy).filter(GeneratedCopy.product_id == product_id).first()
-        
-        issues_data = []
-        for issue in issues:
-            issues_data.append({
+        return cached_response(request, ("summary", min_risk, max_risk, top_issue, search), build)
+
+    except Exception as e:
+        logger.error(f"Failed to summarize products: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Most products /products/details returns in one call
+PRODUCT_DETAILS_MAX_IDS = 200
+
+def product_detail(product: Product) -> Dict[str, Any]:
+    """Detail payload for a product loaded with its issues and generated copy"""
+    generated_copy = product.generated_copy
+    return {
+        "product_id": product.product_id,
+        "risk_score": round(product.risk_score, 3),
+        "top_issue_descriptor": product.top_issue_descriptor,
+        "updated_at": product.updated_at.isoformat() if product.updated_at else None,
+        "issues": [
+            {
                 "issue_category": issue.issue_category,
                 "body_area": issue.body_area or "",
                 "descriptor": issue.descriptor,
                 "severity": round(issue.severity, 2),
                 "frequency_pct": round(issue.frequency_pct, 1)
-            })
-        
-        copy_data = {
+            }
+            for issue in product.issues
+        ],
+        "generated_copy": {
             "size_guidance": generated_copy.size_guidance if generated_copy else "",
             "care_tip": generated_copy.care_tip if generated_copy else ""
         }
-        
-        return {
-            "product_id": product.product_id,
-            "risk_score": round(product.risk_score, 3),
-            "top_issue_descriptor": product.top_issue_descriptor,
-            "updated_at": product.updated_at.isoformat() if product.updated_at else None,
-            "issues": issues_data,
-            "generated_copy": copy_data
-        }
+    }
+
+def render_product_payloads(product: Dict[str, Any], issues: List[Dict[str, Any]], copy: Dict[str, Any]) -> Dict[str, bytes]:
+    """detail_json and summary_json for a product row about to be stored.
+
+    Rendered by the same code that renders them from the stored rows, so
+    serving these bytes only changes what a read costs.
+    """
+    row = SimpleNamespace(
+        **product, issues=[SimpleNamespace(**issue) for issue in issues], generated_copy=SimpleNamespace(**copy)
+    )
+    return {
+        "detail_json": render_json(product_detail(row)),
+        "summary_json": render_json({name: field(row) for name, field in PRODUCT_FIELDS.items()})
+    }
+
+def load_product_detail(db: Session, product_id: str) -> Dict[str, Any]:
+    """Product, issues and copy in a single joined query; 404 if unknown"""
+    product = (
+        db.query(Product)
+        .options(joinedload(Product.issues), joinedload(Product.generated_copy))
+        .filter(Product.product_id == product_id)
+        .first()
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product_detail(product)
+
+def load_product_detail_json(db: Session, product_id: str) -> bytes:
+    """The detail payload /process stored, or one rendered from the rows; 404 if unknown"""
+    row = db.query(Product.detail_json).filter(Product.product_id == product_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if row.detail_json is None:
+        return render_json(load_product_detail(db, product_id))
+    return bytes(row.detail_json)
+
+@app.get("/products/details")
+def get_product_details(
+    request: Request,
+    ids: str,
+    db: Session = Depends(get_db),
+    _: bool = Depends(verify_token)
+):
+    """Get details for several products (comma-separated ids) in one call.
+
+    Items are the payloads /process stored, read with one IN query;
+    products stored before those existed are rendered from their issues
+    and copy. Items follow the order of ids; unknown ids are listed under
+    "missing".
+    """
+    product_ids = list(dict.fromkeys(pid.strip() for pid in ids.split(",") if pid.strip()))
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="No product ids given")
+    if len(product_ids) > PRODUCT_DETAILS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {PRODUCT_DETAILS_MAX_IDS} product ids per request")
+
+    def build() -> bytes:
+        payloads = dict(
+            db.query(Product.product_id, Product.detail_json).filter(Product.product_id.in_(product_ids))
+        )
+        unrendered = [pid for pid, payload in payloads.items() if payload is None]
+        if unrendered:
+            for product in (
+                db.query(Product)
+                .options(selectinload(Product.issues), selectinload(Product.generated_copy))
+                .filter(Product.product_id.in_(unrendered))
+            ):
+                payloads[product.product_id] = render_json(product_detail(product))
+        items = b",".join(payloads[pid] for pid in product_ids if pid in payloads)
+        return b'{"items":[' + items + b"]," + render_json({"missing": [pid for pid in product_ids if pid not in payloads]})[1:]
+
+    try:
+        return cached_response(request, ("details", tuple(product_ids)), build, products=product_ids)
+
+    except Exception as e:
+        logger.error(f"Failed to get product details: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/product/{product_id}")
+def get_product_detail(
+    request: Request,
+    product_id: str,
+    db: Session = Depends(get_db),
+    _: bool = Depends(verify_token)
+):
+    """Get detailed information for a specific product"""
+    try:
+        return cached_response(
+            request, ("product", product_id), lambda: load_product_detail_json(db, product_id), products=[product_id]
+        )
         
     except HTTPException:
         raise
@@ -561,64 +1351,189 @@ async def get_product_detail(
         logger.error(f"Failed to get product detail: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/export/{product_id}")
-async def export_product(
+# Longest window /product/{id}/trend accepts
+TREND_MAX_DAYS = 365
+
+def load_product_trend(
+    db: Session, product_id: str, days: int, end: Optional[date], descriptor: Optional[str]
+) -> Dict[str, Any]:
+    """Issue hits over the last `days` days from the daily rollups, against the window before.
+
+    The window ends at `end`, or at the product's latest dated feedback,
+    so the answer does not depend on when it is asked. Both windows are
+    primary-key range scans of at most 2 * days rows per descriptor.
+    """
+    if end is None:
+        end = db.query(func.max(DailyFeedback.day)).filter(DailyFeedback.product_id == product_id).scalar()
+        if end is None:
+            raise HTTPException(status_code=404, detail="No dated feedback for this product")
+    start = end - timedelta(days=days - 1)
+    previous_start = start - timedelta(days=days)
+
+    texts_by_day = dict(
+        db.query(DailyFeedback.day, DailyFeedback.texts)
+        .filter(DailyFeedback.product_id == product_id, DailyFeedback.day.between(previous_start, end))
+    )
+    hits_query = db.query(DailyIssueHits.day, DailyIssueHits.descriptor, DailyIssueHits.hits).filter(
+        DailyIssueHits.product_id == product_id, DailyIssueHits.day.between(previous_start, end)
+    )
+    if descriptor:
+        hits_query = hits_query.filter(DailyIssueHits.descriptor == descriptor)
+
+    hits_by_day = defaultdict(dict)
+    totals = defaultdict(lambda: [0, 0])  # descriptor -> [window hits, previous window hits]
+    for day, name, hits in hits_query:
+        hits_by_day[day][name] = hits
+        totals[name][0 if day >= start else 1] += hits
+
+    texts = sum(count for day, count in texts_by_day.items() if day >= start)
+    previous_texts = sum(count for day, count in texts_by_day.items() if day < start)
+
+    def rate(hits: int, total: int) -> float:
+        return round(hits / total, 4) if total else 0.0
+
+    return {
+        "product_id": product_id,
+        "days": days,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "texts": texts,
+        "previous_texts": previous_texts,
+        "descriptors": [
+            {
+                "descriptor": name,
+                "hits": hits,
+                "rate": rate(hits, texts),
+                "previous_hits": previous_hits,
+                "previous_rate": rate(previous_hits, previous_texts),
+                "rate_change": round(rate(hits, texts) - rate(previous_hits, previous_texts), 4)
+            }
+            for name, (hits, previous_hits) in sorted(totals.items(), key=lambda item: (-item[1][0], item[0]))
+        ],
+        "daily": [
+            {"day": day.isoformat(), "texts": texts_by_day.get(day, 0), "hits": hits_by_day.get(day, {})}
+            for day in (start + timedelta(days=offset) for offset in range(days))
+        ]
+    }
+
+@app.get("/product/{product_id}/trend")
+def get_product_trend(
+    request: Request,
     product_id: str,
+    days: int = Query(30, ge=1, le=TREND_MAX_DAYS),
+    end: Optional[date] = None,
+    descriptor: Optional[str] = None,
     db: Session = Depends(get_db),
     _: bool = Depends(verify_token)
 ):
-    """Export product data as Markdown"""
+    """Daily issue hits and hit rates for a product over a 7/30/90-day (or any) window.
+
+    Each descriptor's rate is compared with the same-length window just
+    before, so a positive rate_change means the issue is getting worse.
+    """
     try:
-        # Get product data
-        product_data = await get_product_detail(product_id, db, True)
-        
-        # Generate Markdown
-        markdown_content = f"""# Product {product_id}
+        return cached_response(
+            request, ("trend", product_id, days, end, descriptor),
+            lambda: render_json(load_product_trend(db, product_id, days, end, descriptor)),
+            products=[product_id]
+        )
 
-**Risk Score:** {product_data['risk_score']}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get product trend: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-## Size Guidance
-{product_data['generated_copy']['size_guidance'] or 'No guidance available'}
+# Products loaded per round trip while streaming /export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
 
-## Care Tip
-{product_data['generated_copy']['care_tip'] or 'No care tips available'}
+def iter_product_details(
+    min_risk: Optional[float], max_risk: Optional[float], top_issue: Optional[str], search: Optional[str]
+) -> Iterator[Dict[str, Any]]:
+    """Yield detail payloads for the filtered catalog, highest risk first.
 
-## Issues Summary
+    Products are fetched EXPORT_BATCH_SIZE at a time (with one IN query
+    each for their issues and copy), so memory stays flat for any
+    catalog size. Uses its own session because it runs while the
+    response streams, after the request's dependencies have finished.
+    """
+    db = SessionLocal()
+    try:
+        query = (
+            filter_products(db.query(Product), min_risk, max_risk, top_issue, search)
+            .options(selectinload(Product.issues), selectinload(Product.generated_copy))
+            .order_by(Product.risk_score.desc(), Product.product_id)
+        )
+        # Legacy Query.yield_per refuses eager loaders, so run the statement 2.0-style
+        for product in db.scalars(query.statement.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+            yield product_detail(product)
+    finally:
+        db.close()
 
-| Descriptor | Category | Body Area | Frequency % | Severity |
-|------------|----------|-----------|-------------|----------|
-"""
-        
-        for issue in product_data['issues']:
-            markdown_content += f"| {issue['descriptor']} | {issue['issue_category']} | {issue['body_area']} | {issue['frequency_pct']}% | {issue['severity']} |\n"
-        
-        if not product_data['issues']:
-            markdown_content += "| No issues found | - | - | - | - |\n"
-        
-        markdown_content += f"\n---\n*Generated at: {datetime.utcnow().isoformat()}*"
-        
-        return Response(
-            content=markdown_content,
+@app.get("/export")
+def export_catalog(
+    format: str = "ndjson",
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    top_issue: Optional[str] = None,
+    search: Optional[str] = None,
+    _: bool = Depends(verify_token)
+):
+    """Stream every product (or those matching the /products filters) in bulk.
+
+    format is ndjson (one detail document per line), csv (one row per
+    issue) or markdown (a zip of the per-product reports).
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format '{format}', expected one of {list(EXPORT_FORMATS)}")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    details = iter_product_details(min_risk, max_risk, top_issue, search)
+    return StreamingResponse(
+        stream_export(details, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=fitloop_export.{extension}"}
+    )
+
+@app.get("/export/{product_id}")
+def export_product(
+    request: Request,
+    product_id: str,
+    db: Session = Depends(get_db),
+    _: bool = Depends(verify_token)
+):
+    """Export product data as Markdown"""
+    try:
+        # The report is rendered once per processing run, so its timestamp is the render time
+        return cached_response(
+            request, ("export", product_id),
+            lambda: render_markdown(load_product_detail(db, product_id)).encode("utf-8"),
+            products=[product_id],
             media_type="text/markdown",
             headers={"Content-Disposition": f"attachment; filename=product_{product_id}_analysis.md"}
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to export product: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/", response_class=HTMLResponse)
-@app.head("/")
-async def root():
-    """Health check or redirect to UI if built."""
-    if os.path.isdir(FRONTEND_BUILD_DIR):
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics: stage and request latencies, LLM usage, cache hit ratios"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def render_root_page(frontend_built: bool, ai_enabled: bool) -> str:
+    """Landing page linking to whichever frontend is available"""
+    if frontend_built:
         # Provide a small landing page with link to app UI
         return (
             "<html><head><title>FitLoop</title></head><body>"
             "<h2>FitLoop API is running ✅</h2>"
             "<p>React Frontend: <a href='/app'>/app</a></p>"
             "<p>Simple Frontend: <a href='/simple'>/simple</a></p>"
-            f"<p>AI Enabled: {ai_processor.client is not None}</p>"
+            f"<p>AI Enabled: {ai_enabled}</p>"
             "</body></html>"
         )
     return (
@@ -626,42 +1541,38 @@ async def root():
         "<h2>FitLoop API is running ✅</h2>"
         "<p><a href='/simple' style='background: #6366f1; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;'>🚀 Open FitLoop App</a></p>"
         "<p>Simple HTML Frontend (no React build needed)</p>"
-        f"<p>AI Enabled: {ai_processor.client is not None}</p>"
+        f"<p>AI Enabled: {ai_enabled}</p>"
         "<hr><p><small>API Docs: <a href='/docs'>/docs</a></small></p>"
         "</body></html>"
     )
 
+# Both inputs are fixed for the life of the process
+root_page = static_page(render_root_page(os.path.isdir(FRONTEND_BUILD_DIR), ai_processor.llm_enabled))
+
+@app.get("/", response_class=HTMLResponse)
+@app.head("/")
+def root(request: Request):
+    """Health check or redirect to UI if built."""
+    return serve_static(root_page, request.headers)
+
 # Serve React app assets directly at root level (for React build compatibility)
 @app.get("/assets/{file_path:path}")
-async def serve_assets(file_path: str):
+def serve_assets(file_path: str, request: Request):
     """Serve React assets from /assets path"""
-    if os.path.isdir(FRONTEND_BUILD_DIR):
-        assets_dir = os.path.join(FRONTEND_BUILD_DIR, 'assets')
-        file_full_path = os.path.join(assets_dir, file_path)
-        if os.path.isfile(file_full_path):
-            with open(file_full_path, 'rb') as f:
-                content = f.read()
-            # Determine content type
-            if file_path.endswith('.js'):
-                media_type = 'application/javascript'
-            elif file_path.endswith('.css'):
-                media_type = 'text/css'
-            else:
-                media_type = 'application/octet-stream'
-            return Response(content=content, media_type=media_type)
-    raise HTTPException(status_code=404, detail="Asset not found")
+    static_file = frontend_files.get(f"assets/{file_path}")
+    if not static_file:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return serve_static(static_file, request.headers)
 
 # React SPA routes - all should serve index.html for client-side routing
 @app.get("/app")
 @app.get("/app/{path:path}")
-async def serve_react_app(path: str = ""):
+def serve_react_app(request: Request, path: str = ""):
     """Serve React SPA for all /app routes"""
-    if os.path.isdir(FRONTEND_BUILD_DIR):
-        index_path = os.path.join(FRONTEND_BUILD_DIR, 'index.html')
-        if os.path.isfile(index_path):
-            with open(index_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return HTMLResponse(content=content)
+    # Root-level build files (favicon etc.) are served as themselves
+    static_file = (path and frontend_files.get(path)) or frontend_files.get("index.html")
+    if static_file:
+        return serve_static(static_file, request.headers)
     # Fallback to simple frontend if React build not available
     return HTMLResponse(content='<script>window.location.href="/simple";</script>')
 
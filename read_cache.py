@@ -0,0 +1,93 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, FrozenSet, Hashable, Iterable, Optional
+
+class CachedBody:
+    """A rendered response body with its ETag"""
+
+    __slots__ = ("body", "etag", "products")
+
+    def __init__(self, body: bytes, products: Optional[FrozenSet[str]]):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.products = products
+
+class ReadCache:
+    """Bounded LRU of rendered read responses, invalidated when results change.
+
+    Each entry records the products it was built from, or None when it
+    depends on the whole catalog (list pages, summaries). invalidate()
+    drops the entries for the given products plus every catalog-wide one.
+    A generation counter stops a read that raced an invalidation from
+    caching what it saw before the write.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ReadCache":
+        """Build a cache from READ_CACHE_* settings; 0 entries disables caching"""
+        return cls(
+            max_entries=int(os.getenv("READ_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(os.getenv("READ_CACHE_MAX_MB", "64")) * 1024 * 1024
+        )
+
+    def get_or_build(
+        self,
+        key: Hashable,
+        build: Callable[[], bytes],
+        products: Optional[Iterable[str]] = None
+    ) -> CachedBody:
+        """Return the cached body for key, rendering and storing it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            generation = self.generation
+
+        entry = CachedBody(build(), frozenset(products) if products is not None else None)
+        size = len(entry.body)
+        with self._lock:
+            if generation != self.generation or size > self.max_bytes or self.max_entries <= 0:
+                return entry
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+        return entry
+
+    def invalidate(self, product_ids: Iterable[str]):
+        """Drop entries built from any of product_ids and all catalog-wide entries"""
+        changed = set(product_ids)
+        with self._lock:
+            self.generation += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry.products is None or not changed.isdisjoint(entry.products)
+            ]
+            for key in stale:
+                self._bytes -= len(self._entries.pop(key).body)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
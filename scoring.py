@@ -0,0 +1,66 @@
+import numpy as np
+from typing import Dict, Sequence
+
+# Weights of normalized severity and frequency in an issue's risk
+SEVERITY_WEIGHT = 0.6
+FREQUENCY_WEIGHT = 0.4
+
+def _normalize(values: np.ndarray, starts: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Min-max normalize within each product, 0.5 when its values are all equal"""
+    lows = np.minimum.reduceat(values, starts)[codes]
+    ranges = np.maximum.reduceat(values, starts)[codes] - lows
+    safe_ranges = np.where(ranges > 0, ranges, 1.0)
+    return np.where(ranges > 0, (values - lows) / safe_ranges, 0.5)
+
+def score_table(
+    product_ids: Sequence[str],
+    severities: Sequence[float],
+    frequencies: Sequence[float]
+) -> Dict[str, np.ndarray]:
+    """Score a columnar table of aggregated issues, one row per issue.
+
+    Rows must be grouped by product (each product's issues contiguous),
+    which is how /process builds the table; no sorting is done here.
+
+    Within each product, severity and frequency are min-max normalized
+    (a product with a single issue uses severity / 5 and frequency / 100
+    instead), weighted 0.6 / 0.4 and averaged into the product's risk
+    score. The top issue is the first row with the highest
+    severity * frequency_pct.
+
+    Returns "products" (ids in input order), "risk_score" and "top_index"
+    (row index of each product's top issue) aligned with it, and
+    "issue_score" with each row's weighted score.
+    """
+    product_ids = np.asarray(product_ids)
+    severities = np.asarray(severities, dtype=np.float64)
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    rows = product_ids.size
+    if rows == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return {"products": product_ids, "risk_score": empty, "top_index": np.empty(0, dtype=np.intp), "issue_score": empty}
+
+    # Group boundaries and each row's group number
+    boundaries = np.flatnonzero(product_ids[1:] != product_ids[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    counts = np.diff(np.append(starts, rows))
+    codes = np.repeat(np.arange(starts.size), counts)
+
+    single = counts[codes] == 1
+    severity_norm = np.where(single, severities / 5.0, _normalize(severities, starts, codes))
+    frequency_norm = np.where(single, frequencies / 100.0, _normalize(frequencies, starts, codes))
+
+    issue_score = SEVERITY_WEIGHT * severity_norm + FREQUENCY_WEIGHT * frequency_norm
+    risk_score = np.add.reduceat(issue_score, starts) / counts
+
+    # Highest severity * frequency per product, earliest row on ties
+    impact = severities * frequencies
+    is_top = impact == np.maximum.reduceat(impact, starts)[codes]
+    top_index = np.minimum.reduceat(np.where(is_top, np.arange(rows), rows), starts)
+
+    return {
+        "products": product_ids[starts],
+        "risk_score": risk_score,
+        "top_index": top_index,
+        "issue_score": issue_score
+    }
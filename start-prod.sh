@@ -4,7 +4,7 @@
 echo "🚀 Starting FitLoop Production Server"
 
 # Install production dependencies
-pip install uvicorn[standard] fastapi sqlalchemy openai python-dotenv requests python-multipart
+pip install uvicorn[standard] fastapi sqlalchemy openai python-dotenv requests python-multipart numpy
 
 # Start the server
 uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000}
\ No newline at end of file
@@ -0,0 +1,225 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional; .br files from the build are still served
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Extensions worth compressing; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = {".js", ".mjs", ".css", ".html", ".json", ".svg", ".txt", ".map", ".xml", ".webmanifest"}
+
+# Files below this are sent as-is; compression would barely save a packet
+MIN_COMPRESS_BYTES = 1024
+
+# Vite fingerprints everything under assets/, so those names never change content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+class StaticFile:
+    """A preloaded build file with its compressed variants"""
+
+    __slots__ = ("path", "content", "media_type", "etag", "cache_control", "variants")
+
+    def __init__(self, path: str, content: Optional[bytes], media_type: str, etag: str, cache_control: str):
+        self.path = path
+        self.content = content
+        self.media_type = media_type
+        self.etag = etag
+        self.cache_control = cache_control
+        self.variants: Dict[str, bytes] = {}
+
+class StaticIndex:
+    """In-memory index of a frontend build directory.
+
+    The directory is read once: every file up to max_preload_bytes is
+    kept in memory with its ETag and, for text formats, gzip (and brotli
+    when available, or when the build shipped .gz/.br siblings) variants.
+    Responses then never touch the disk; larger files are streamed.
+    """
+
+    def __init__(self, root: str, max_preload_bytes: int = 10 * 1024 * 1024):
+        self.root = os.path.realpath(root)
+        self.max_preload_bytes = max_preload_bytes
+        self._files: Optional[Dict[str, StaticFile]] = None
+        self._lock = threading.Lock()
+
+    def files(self) -> Dict[str, StaticFile]:
+        """Relative path -> StaticFile, loading the directory on first use"""
+        if self._files is None:
+            with self._lock:
+                if self._files is None:
+                    self._files = self._load()
+        return self._files
+
+    def get(self, relative_path: str) -> Optional[StaticFile]:
+        return self.files().get(relative_path.lstrip("/"))
+
+    def _load(self) -> Dict[str, StaticFile]:
+        files = {}
+        if not os.path.isdir(self.root):
+            return files
+
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if relative.endswith((".gz", ".br")) and os.path.isfile(path[:-3]):
+                    continue
+                files[relative] = self._load_file(path, relative)
+
+        logger.info(f"Indexed {len(files)} static files from {self.root}")
+        return files
+
+    def _load_file(self, path: str, relative: str) -> StaticFile:
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        # Response already adds a charset to text/* types
+        if media_type in ("application/javascript", "application/json", "image/svg+xml"):
+            media_type += "; charset=utf-8"
+        cache_control = IMMUTABLE_CACHE_CONTROL if relative.startswith("assets/") else REVALIDATE_CACHE_CONTROL
+
+        stat = os.stat(path)
+        if stat.st_size > self.max_preload_bytes:
+            etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+            return StaticFile(path, None, media_type, etag, cache_control)
+
+        with open(path, "rb") as f:
+            content = f.read()
+        static_file = StaticFile(path, content, media_type, content_etag(content), cache_control)
+
+        # Prefer variants the build already produced, then compress here
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if os.path.isfile(path + suffix):
+                with open(path + suffix, "rb") as f:
+                    static_file.variants[encoding] = f.read()
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension in COMPRESSIBLE_EXTENSIONS:
+            add_compressed_variants(static_file)
+        else:
+            static_file.variants = smaller_variants(static_file)
+        return static_file
+
+def content_etag(content: bytes) -> str:
+    """Strong ETag from a hash of the content"""
+    return '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+
+def smaller_variants(static_file: StaticFile) -> Dict[str, bytes]:
+    """The file's variants that are actually smaller than its content"""
+    return {encoding: data for encoding, data in static_file.variants.items() if len(data) < len(static_file.content)}
+
+def add_compressed_variants(static_file: StaticFile):
+    """Compress a preloaded text file into the variants it does not have yet"""
+    content = static_file.content
+    if len(content) >= MIN_COMPRESS_BYTES:
+        if "br" not in static_file.variants and brotli is not None:
+            static_file.variants["br"] = brotli.compress(content, quality=11)
+        if "gzip" not in static_file.variants:
+            static_file.variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+    static_file.variants = smaller_variants(static_file)
+
+def static_page(content: str, media_type: str = "text/html") -> StaticFile:
+    """An in-memory page (e.g. generated HTML), compressed once and served like a build file"""
+    data = content.encode("utf-8")
+    static_file = StaticFile("", data, media_type, content_etag(data), REVALIDATE_CACHE_CONTROL)
+    add_compressed_variants(static_file)
+    return static_file
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    """Content codings the client accepts (q > 0)"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single "bytes=" range.
+
+    Returns None when there is no usable single range (the whole file is
+    sent) and raises ValueError when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, sep, end_text = range_header[len("bytes="):].strip().partition("-")
+    if not sep or (start_text and not start_text.isdigit()) or (end_text and not end_text.isdigit()):
+        return None
+
+    if not start_text:
+        if not end_text:
+            return None
+        suffix = int(end_text)
+        if suffix == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(size - suffix, 0), size - 1
+
+    start = int(start_text)
+    if end_text and int(end_text) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, min(int(end_text), size - 1) if end_text else size - 1
+
+def variant_etag(etag: str, encoding: str) -> str:
+    """Distinct strong validator for a compressed representation"""
+    return f'{etag[:-1]}-{encoding}"'
+
+def serve_static(static_file: StaticFile, headers) -> Response:
+    """Respond with a preloaded file, honoring If-None-Match, Accept-Encoding and Range"""
+    response_headers = {
+        "ETag": static_file.etag,
+        "Cache-Control": static_file.cache_control,
+        "Vary": "Accept-Encoding",
+        "Accept-Ranges": "bytes"
+    }
+    accepted = accepted_encodings(headers.get("accept-encoding"))
+    encoding = next((name for name in ("br", "gzip") if name in static_file.variants and name in accepted), None)
+    if encoding:
+        response_headers["ETag"] = variant_etag(static_file.etag, encoding)
+
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in candidates or response_headers["ETag"] in candidates:
+            return Response(status_code=304, headers=response_headers)
+
+    if static_file.content is None:
+        # Too big to preload: stream it, without range support
+        del response_headers["Accept-Ranges"]
+        return FileResponse(static_file.path, media_type=static_file.media_type, headers=response_headers)
+
+    content = static_file.content
+    try:
+        byte_range = parse_range(headers.get("range"), len(content))
+    except ValueError:
+        return Response(status_code=416, headers={**response_headers, "Content-Range": f"bytes */{len(content)}"})
+
+    if byte_range is not None:
+        # Ranges address the identity representation
+        start, end = byte_range
+        response_headers["ETag"] = static_file.etag
+        response_headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+        return Response(content=content[start:end + 1], status_code=206, media_type=static_file.media_type, headers=response_headers)
+
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+        return Response(content=static_file.variants[encoding], media_type=static_file.media_type, headers=response_headers)
+
+    return Response(content=content, media_type=static_file.media_type, headers=response_headers)
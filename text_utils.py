@@ -0,0 +1,32 @@
+import re
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
+_STRIP_CHARS = re.compile(r'[^\w\s\-\.,!?]')
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a feedback text.
+
+    Lowercased, with emojis and symbols dropped, whitespace collapsed and
+    punctuation trimmed from both ends, so "Runs small!" and "runs small."
+    are one text.
+    """
+    if not text:
+        return ""
+    return " ".join(_STRIP_CHARS.sub('', text.lower()).split()).strip(" .,!?-")
+
+def text_hash(normalized: str) -> str:
+    """Short stable hash of a normalized text, used to group duplicates in SQL"""
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+def collapse_texts(texts: Iterable[str]) -> List[Tuple[str, int]]:
+    """Normalize raw texts into (text, count) pairs, most frequent first"""
+    counts: Dict[str, int] = {}
+    for text in texts:
+        normalized = normalize_text(text)
+        counts[normalized] = counts.get(normalized, 0) + 1
+    return sorted(counts.items(), key=lambda pair: -pair[1])
+
+def feedback_count(feedback: List[Tuple[str, int]]) -> int:
+    """Number of texts a list of (text, count) pairs stands for"""
+    return sum(count for _, count in feedback)